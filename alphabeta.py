@@ -1,5 +1,7 @@
-
 from pacman_module.game import Agent
+from parallel import RootSearchPool
+from minimax import CONTEXT_BITS
+from transposition import TranspositionTable
 import numpy as np
 
 
@@ -12,6 +14,19 @@ class PacmanAgent(Agent):
         - `args`: Namespace of arguments from command-line prompt.
         """
         self.args = args
+        # Kept across moves since values are stored relative to the score
+        self.table = TranspositionTable(getattr(args, 'ttsize', 2 ** 18))
+        self.nbNodes = 0
+        # Move ordering statistics, kept across moves
+        self.ordering = getattr(args, 'moveordering', 'distance')
+        self.killers = dict()  # ply -> last two moves causing a cutoff
+        self.history = dict()  # (PacmanTurn, cell, move) -> cutoff score
+        # Half-width of the root aspiration window (0 for a full window)
+        self.aspiration = getattr(args, 'aspiration', 10)
+        self.lastValue = None  # Root value found at the previous move
+        # Root subtrees are searched by worker processes if any
+        workers = getattr(args, 'workers', 0)
+        self.pool = RootSearchPool(self, workers) if workers > 0 else None
 
     def get_action(self, state):
         """
@@ -29,36 +44,113 @@ class PacmanAgent(Agent):
         - A legal move as defined in `game.Directions`.
         """
 
-        sons = state.generatePacmanSuccessors()
+        # Age the history so that recent cutoffs weigh more
+        self.history = {k: v // 2 for k, v in self.history.items() if v > 1}
+
+        sons = self.orderSons(state, state.generatePacmanSuccessors(),
+                              True, 0)
+
+        # Against the predicted ghost moves, the game outcome does not
+        # change from one move to the next: search around it first
+        if self.aspiration and self.lastValue is not None and \
+                np.isfinite(self.lastValue):
+            alpha = self.lastValue - self.aspiration
+            beta = self.lastValue + self.aspiration
+        else:
+            alpha = -np.inf
+            beta = np.inf
+
+        while True:
+            value, ret = self.searchRoot(state, sons, alpha, beta)
+            if value <= alpha and alpha != -np.inf:  # Fail low
+                alpha = -np.inf
+            elif value >= beta and beta != np.inf:  # Fail high
+                beta = np.inf
+            else:
+                break
+
+        self.lastValue = value
+        return ret
+
+    def searchRoot(self, state, sons, alpha, beta):
+        """
+        Given a pacman game state, its sons and an alpha-beta window,
+        searches the sons, raising alpha as better moves are found. In
+        parallel mode, the eldest son is searched first, then its brothers
+        at once in the raised window (Young Brothers Wait).
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+        - `sons`: list of (successor state, move) pairs of `state`.
+        - 'alpha': lower bound of the window.
+        - 'beta': upper bound of the window.
+
+        Return:
+        -------
+        - A tuple (value, move) with the best value and its move. A value
+        outside of the window is only a bound on the true value.
+        """
 
         sentinel = -np.inf
-        alpha = -np.inf
-        beta = np.inf
+        ret = sons[0][1]
+        rootKey = self.generateKey(state, True)
 
-        for son in sons:
-            val = self.minimax(son[0], False,
-                               {self.generateKey(state, True)}, alpha, beta)
+        eldest = sons[:1] if self.pool is not None else sons
+        for son in eldest:
+            val = self.searchRootSon(son[0], rootKey, alpha, beta)
             if val > sentinel:
                 sentinel = val
                 ret = son[1]
 
-        return ret
+            alpha = max(alpha, val)
+            if alpha >= beta:
+                self.recordCutoff(state, son[1], True, 0)
+                return sentinel, ret
+
+        brothers = sons[len(eldest):]
+        if brothers:
+            values = self.pool.search([son[0] for son in brothers],
+                                      [(rootKey, alpha, beta)] * len(brothers))
+            for son, val in zip(brothers, values):
+                if val > sentinel:
+                    sentinel = val
+                    ret = son[1]
+            if sentinel >= beta:
+                self.recordCutoff(state, ret, True, 0)
+
+        return sentinel, ret
+
+    def searchRootSon(self, state, rootKey, alpha, beta):
+        """
+        Given a son of the root, the context key of the root and an
+        alpha-beta window, returns the value of the son. Called by the
+        worker processes in parallel mode (see parallel.py).
+        """
 
-    def minimax(self, state, PacmanTurn, visited, alpha, beta):
+        self.cycleCut = False
+        self.contexts = 0
+        return self.minimax(state, False, {rootKey}, alpha, beta, 1,
+                            self.contextBit(rootKey))
+
+    def minimax(self, state, PacmanTurn, visited, alpha, beta, ply, path):
         """
-        Given a pacman game state, a player turn boolean, a set of visited
-        nodes and alpha beta sentinels, returns the value returned by 
-        the corresponding minimax tree.
+        Given a pacman game state, a player turn boolean, the visited
+        nodes, alpha beta sentinels and the current ply, returns the value
+        returned by the corresponding minimax tree.
 
         Arguments:
         ----------
         - `state`: the current game state. 
         - 'PacmanTurn': If True, Pacman is playing. Otherwise
         the Ghost is playing.
-        -'visited': set of context treated in the active branch of
-        the tree to avoid cycles. 
+        -'visited': set of the contexts treated in the active branch of
+        the tree, to avoid cycles. The context of `state` is added on
+        entry and removed on exit.
         - 'alpha': the smallest leaf result encountered 
         - 'beta': the highest leaf result encountered
+        - 'ply': number of moves between the root and `state`.
+        - 'path': bit set of the contexts of `visited` (see contextBit).
 
         Return:
         -------
@@ -69,55 +161,213 @@ class PacmanAgent(Agent):
             return state.getScore()  # Game over, return the result
 
         key = self.generateKey(state, PacmanTurn)
+        ttKey = self.tableKey(state, PacmanTurn)
+        entry = self.table.probe(ttKey)
+        entryContexts = 0
+        # Subtree already searched from another path, which it cannot cut
+        if entry is not None and not entry[4] & path:
+            value = state.getScore() + entry[0]
+            entryContexts = entry[4]
+            if entry[1] == TranspositionTable.EXACT:
+                self.contexts |= entryContexts
+                return value
+            elif entry[1] == TranspositionTable.LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                self.contexts |= entryContexts
+                return value
+
         visited.add(key)  # the context is being visited
+        self.nbNodes += 1
+        nbNodes = self.nbNodes
+        outerCut = self.cycleCut
+        outerContexts = self.contexts
+        self.cycleCut = False
+        self.contexts = entryContexts  # The window may come from the entry
+        path |= self.contextBit(key)
+        window = (alpha, beta)
 
         if PacmanTurn:
             maxGameSum = -np.inf
 
-            sons = state.generatePacmanSuccessors()
+            sons = self.orderSons(state, state.generatePacmanSuccessors(),
+                                  PacmanTurn, ply)
             for son in sons:
                 key_son = self.generateKey(son[0], not PacmanTurn)
+                self.contexts |= self.contextBit(key_son)
 
                 if key_son in visited:  # If son context already visited
+                    self.cycleCut = True
                     continue
 
-                gameSum = self.minimax(son[0], not PacmanTurn, visited.copy(),
-                                       alpha, beta)
+                gameSum = self.minimax(son[0], not PacmanTurn, visited,
+                                       alpha, beta, ply + 1, path)
                 maxGameSum = max((maxGameSum, gameSum))
 
                 alpha = max(alpha, gameSum)
                 if alpha >= beta:
+                    self.recordCutoff(state, son[1], PacmanTurn, ply)
                     break
 
              # Ignore the node if it has no sons and it is not final
             if maxGameSum == -np.inf:
-                return np.inf
+                maxGameSum = np.inf
 
-            return maxGameSum
+            visited.remove(key)  # the context leaves the active branch
+            return self.storeResult(state, ttKey, maxGameSum, window,
+                                    nbNodes, outerCut, outerContexts)
 
         else:
             minGameSum = np.inf
 
-            sons = state.generateGhostSuccessors(1)
+            sons = self.orderSons(state, state.generateGhostSuccessors(1),
+                                  PacmanTurn, ply)
             for son in sons:
                 key_son = self.generateKey(son[0], not PacmanTurn)
+                self.contexts |= self.contextBit(key_son)
 
                 if key_son in visited:  # If son context already visited
+                    self.cycleCut = True
                     continue
 
-                gameSum = self.minimax(son[0], not PacmanTurn, visited.copy(),
-                                       alpha, beta)
+                gameSum = self.minimax(son[0], not PacmanTurn, visited,
+                                       alpha, beta, ply + 1, path)
                 minGameSum = min(minGameSum, gameSum)
 
                 beta = min(beta, gameSum)
                 if beta <= alpha:
+                    self.recordCutoff(state, son[1], PacmanTurn, ply)
                     break
 
             # Ignore the node if it has no sons and it is not final
             if minGameSum == np.inf:
-                return -np.inf
+                minGameSum = -np.inf
 
-            return minGameSum
+            visited.remove(key)  # the context leaves the active branch
+            return self.storeResult(state, ttKey, minGameSum, window,
+                                    nbNodes, outerCut, outerContexts)
+
+    def moverCell(self, state, PacmanTurn):
+        """
+        Given a game state and a player turn boolean, returns the cell of
+        the agent to move.
+        """
+
+        if PacmanTurn:
+            return state.getPacmanPosition()
+        return state.getGhostPositions()[0]
+
+    def orderSons(self, state, sons, PacmanTurn, ply):
+        """
+        Given a game state and its sons, returns the sons sorted so that
+        the moves most likely to cause a cutoff are searched first: moves
+        with the highest history score, then killer moves of the ply, then
+        (with distance ordering) moves getting Pacman closest to a dot, or
+        the ghost closest to Pacman.
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+        - `sons`: list of (successor state, move) pairs of `state`.
+        - 'PacmanTurn': If True, Pacman is playing. Otherwise
+        the Ghost is playing.
+        - 'ply': number of moves between the root and `state`.
+
+        Return:
+        -------
+        - The sorted list of sons.
+        """
+
+        if self.ordering == 'none' or len(sons) < 2:
+            return sons
+
+        killers = self.killers.get(ply, ())
+        cell = self.moverCell(state, PacmanTurn)
+        distances = state.getMazeDistances()
+
+        def priority(son):
+            succ, move = son
+            if move in killers:
+                killer = 2 - killers.index(move)
+            else:
+                killer = 0
+            history = self.history.get((PacmanTurn, cell, move), 0)
+            if self.ordering != 'distance' or succ.isWin() or succ.isLose():
+                return (history, killer, 0)
+            if PacmanTurn:
+                pacmanPos = succ.getPacmanPosition()
+                dist = min([distances.distance(pacmanPos, food)
+                            for food in succ.getFood().asList()])
+            else:
+                dist = distances.distance(succ.getGhostPositions()[0],
+                                          succ.getPacmanPosition())
+            return (history, killer, -dist)
+
+        # The sort is stable: ties keep the order of the legal moves
+        return sorted(sons, key=priority, reverse=True)
+
+    def recordCutoff(self, state, move, PacmanTurn, ply):
+        """
+        Given a game state and the move that caused a cutoff, updates the
+        killer moves of the ply and the history table.
+        """
+
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+
+        key = (PacmanTurn, self.moverCell(state, PacmanTurn), move)
+        self.history[key] = self.history.get(key, 0) + 1
+
+    def storeResult(self, state, ttKey, value, window, nbNodes, outerCut,
+                    outerContexts):
+        """
+        Given a searched game state and its value, stores the value in the
+        transposition table if no cycle was cut in the subtree of the
+        state, along with the contexts tested in the subtree (see
+        minimax.py), then returns it. Bounds only depend on the searched
+        sons, so that they hold under any path which none of these
+        contexts is on.
+
+        Arguments:
+        ----------
+        - `state`: the searched game state.
+        - `ttKey`: transposition table key of `state`.
+        - `value`: the value found by the search of `state`.
+        - `window`: the (alpha, beta) window `state` was searched with.
+        - `nbNodes`: node counter when `state` was entered.
+        - `outerCut`: whether a cycle was cut before `state` was entered.
+        - `outerContexts`: contexts tested before `state` was entered.
+
+        Return:
+        -------
+        - `value`.
+        """
+
+        if not self.cycleCut:
+            if value <= window[0]:
+                flag = TranspositionTable.UPPER
+            elif value >= window[1]:
+                flag = TranspositionTable.LOWER
+            else:
+                flag = TranspositionTable.EXACT
+            self.table.store(ttKey, value - state.getScore(), flag,
+                             self.nbNodes - nbNodes + 1,
+                             contexts=self.contexts)
+        self.cycleCut = outerCut or self.cycleCut
+        self.contexts |= outerContexts
+
+        return value
+
+    def contextBit(self, key):
+        """
+        Given a context, returns its bit in the bit sets of contexts.
+        """
+
+        return 1 << (hash(key) % CONTEXT_BITS)
 
     def generateKey(self, state, PacmanTurn):
         """
@@ -132,38 +382,30 @@ class PacmanAgent(Agent):
 
         Return:
         -------
-        - List of int value. (x1, y1, x2, y2, ...)
+        - A tuple (PacmanTurn, x1, y1, x2, y2, Zobrist hash of the dots)
         """
 
         pacmanPos = state.getPacmanPosition()
         ghostPos = state.getGhostPosition(1)
-        foods = state.getFood()
-
-        ret = [PacmanTurn, pacmanPos[0], pacmanPos[1],
-               int(ghostPos[0]), int(ghostPos[1])]
 
-        ret.extend(self.posFood(foods))
+        return (PacmanTurn, pacmanPos[0], pacmanPos[1],
+                int(ghostPos[0]), int(ghostPos[1]), state.boardZobrist())
 
-        return tuple(ret)
-
-    def posFood(self, foods):
+    def tableKey(self, state, PacmanTurn):
         """
-        Given a food matrix, return the list of all dot positions according to
-        the matrix.
+        Given a game state and a player turn boolean, returns the
+        transposition table key of the state. Unlike `generateKey`, it
+        accounts for the ghost direction which restricts its legal moves.
 
         Arguments:
         ----------
-        - `food`: A food matrix object.
+        - `state`: the current game state. 
+        - 'PacmanTurn': If True, Pacman is playing. Otherwise the Ghost 
+        is playing.
 
         Return:
         -------
-        - List of int value. (x1, y1, x2, y2, ...)
+        - A tuple (PacmanTurn, Zobrist hash of the state).
         """
 
-        foods_pos = []
-        for i in range(foods.width):
-            for j in range(foods.height):
-                if foods[i][j]:
-                    foods_pos.extend([i, j])
-
-        return foods_pos
+        return (PacmanTurn, state.zobrist())
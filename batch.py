@@ -0,0 +1,138 @@
+from concurrent.futures import ProcessPoolExecutor
+from pacman_module import layout, textDisplay
+from pacman_module.game import Game
+from pacman_module.pacman import ClassicGameRules
+import copy
+import json
+import random
+import numpy as np
+
+# Statistics summarizing the games of a batch
+FIELDS = ('score', 'time', 'nodes', 'moves', 'move_time_p95',
+          'move_time_max')
+PERCENTILES = (5, 50, 95)
+
+
+def playGame(task):
+    """
+    Plays one game of a batch, without display.
+
+    Arguments:
+    ----------
+    - `task`: tuple (Pacman agent class, Namespace of arguments from
+              command-line prompt, layout name, ghost agent name, ghost
+              agent class, seed).
+
+    Return:
+    -------
+    - A dict with the layout, ghost agent and seed of the game, its final
+    score, whether Pacman won, and for Pacman: its computation time, the
+    number of nodes it expanded, its number of moves and the p95 and max
+    of its move times.
+    """
+
+    agentClass, args, layoutName, ghostName, ghostClass, seed = task
+    random.seed(seed)
+    np.random.seed(seed)
+
+    # The agent sees the settings of its own game only
+    args = copy.copy(args)
+    args.layout = layoutName
+    args.ghostagent = ghostName
+    args.seed = seed
+
+    agent = agentClass(args)
+    if getattr(args, 'trusted', False):
+        agent.trusted = True
+    Game.checkTrusted = getattr(args, 'checktrusted', False)
+    ghost = ghostClass(1)
+    ghost.seed(seed)
+    rules = ClassicGameRules(0)
+    game = rules.newGame(layout.getLayout(layoutName), agent, [ghost],
+                         textDisplay.NullGraphics(), True, False)
+    score, computationTime, expandedNodes = game.run()
+    pacman = game.metrics.summary()[0]
+
+    return {'layout': layoutName, 'ghostagent': ghostName, 'seed': seed,
+            'score': score, 'win': game.state.isWin(),
+            'time': computationTime, 'nodes': expandedNodes,
+            'moves': pacman['moves'],
+            'move_time_p95': pacman['wallTime_p95'],
+            'move_time_max': pacman['wallTime_max']}
+
+
+def runBatch(tasks, processes):
+    """
+    Plays the games of a batch in a pool of processes.
+
+    Arguments:
+    ----------
+    - `tasks`: list of the tasks of the games (see playGame).
+    - `processes`: number of games played at once.
+
+    Return:
+    -------
+    - The list of the records of the games (see playGame), in order.
+    """
+
+    with ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(playGame, tasks))
+
+
+def writeRecords(path, records):
+    """
+    Writes the records of the games to a file, one JSON object per line.
+    """
+
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def summarize(records):
+    """
+    Given the records of the games of a batch, returns their statistics
+    by layout and ghost agent.
+
+    Return:
+    -------
+    - A list of dicts holding the layout, the ghost agent, the number of
+    games and the win rate of a group of games, as well as the mean,
+    standard deviation and percentiles of every field in FIELDS, e.g.
+    'score_mean', 'score_std' or 'score_p95'.
+    """
+
+    groups = dict()
+    for record in records:
+        key = (record['layout'], record['ghostagent'])
+        groups.setdefault(key, []).append(record)
+
+    summaries = []
+    for (layoutName, ghostName), group in groups.items():
+        summary = {'layout': layoutName, 'ghostagent': ghostName,
+                   'games': len(group),
+                   'win_rate': np.mean([r['win'] for r in group])}
+        for field in FIELDS:
+            values = np.array([r[field] for r in group], dtype=float)
+            summary[field + '_mean'] = values.mean()
+            summary[field + '_std'] = values.std()
+            for p, value in zip(PERCENTILES,
+                                np.percentile(values, PERCENTILES)):
+                summary['%s_p%d' % (field, p)] = value
+        summaries.append(summary)
+    return summaries
+
+
+def printSummary(summaries):
+    """
+    Prints the statistics of a batch, one line per layout and ghost agent.
+    """
+
+    for s in summaries:
+        print('%s / %s: %d games, win rate %.2f' % (
+            s['layout'], s['ghostagent'], s['games'], s['win_rate']))
+        for field in FIELDS:
+            print('    %-13s mean %10.3f  std %10.3f  ' % (
+                field, s[field + '_mean'], s[field + '_std']) +
+                '  '.join(['p%d %10.3f' % (p, s['%s_p%d' % (field, p)])
+                           for p in PERCENTILES]))
@@ -0,0 +1,196 @@
+# benchmarks
+# ----------
+# Microbenchmarks of the hot paths of the game engine, run on every layout
+# of pacman_module/layouts. See __main__.py for the command line.
+
+import gc
+import glob
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from pacman_module import layout
+from pacman_module.ghostAgents import DumbyGhost, GreedyGhost, SmartyGhost
+from pacman_module.pacman import GameState
+
+LAYOUT_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'pacman_module', 'layouts')
+
+
+def sampleStates(lay, numStates, rng):
+    """
+    Returns a list of (state, agent index) pairs of non-final states of a
+    layout, reached by random games against one ghost (if the layout has
+    one).
+    """
+    initial = GameState()
+    initial.initialize(lay, 1)
+    samples = []
+    state, agent = initial, 0
+    while len(samples) < numStates:
+        samples.append((state, agent))
+        son = state.generateSuccessor(
+            agent, rng.choice(state.getLegalActions(agent)))
+        if son.isWin() or son.isLose():
+            state, agent = initial, 0
+        else:
+            state, agent = son, (agent + 1) % son.getNumAgents()
+    return samples
+
+
+def ghostDistributions(ghost):
+    return lambda states: [ghost.getDistribution(s) for s in states]
+
+
+# Benchmarks, as (name, needs a ghost, items, operation) tuples: `items`
+# builds the list of the operands from the sampled states and a random
+# number generator, and `operation` applies the benchmarked operation to
+# every operand, returning the list of the results. Benchmarks which need
+# a ghost are skipped on layouts without one.
+BENCHMARKS = [
+    ('generateSuccessor', False,
+     lambda samples, rng: [(s, agent, rng.choice(s.getLegalActions(agent)))
+                           for s, agent in samples],
+     lambda items: [s.generateSuccessor(agent, action)
+                    for s, agent, action in items]),
+    ('generatePacmanSuccessors', False,
+     lambda samples, rng: [s for s, agent in samples],
+     lambda states: [s.generatePacmanSuccessors() for s in states]),
+    ('generateGhostSuccessors', True,
+     lambda samples, rng: [s for s, agent in samples],
+     lambda states: [s.generateGhostSuccessors(1) for s in states]),
+    ('GameStateData.__hash__', False,
+     lambda samples, rng: [s.data for s, agent in samples],
+     lambda datas: [hash(data) for data in datas]),
+    ('GameStateData.__eq__', False,
+     lambda samples, rng: [(s.data, s.deepCopy().data)
+                           for s, agent in samples],
+     lambda pairs: [a == b for a, b in pairs]),
+    ('Grid.copy', False,
+     lambda samples, rng: [s.data.food for s, agent in samples],
+     lambda grids: [grid.copy() for grid in grids]),
+    ('Grid.count', False,
+     lambda samples, rng: [s.data.food for s, agent in samples],
+     lambda grids: [grid.count() for grid in grids]),
+    ('GameState.deepCopy', False,
+     lambda samples, rng: [s for s, agent in samples],
+     lambda states: [s.deepCopy() for s in states]),
+    ('GreedyGhost.getDistribution', True,
+     lambda samples, rng: [s for s, agent in samples],
+     ghostDistributions(GreedyGhost(1))),
+    ('DumbyGhost.getDistribution', True,
+     lambda samples, rng: [s for s, agent in samples],
+     ghostDistributions(DumbyGhost(1))),
+    ('SmartyGhost.getDistribution', True,
+     lambda samples, rng: [s for s, agent in samples],
+     ghostDistributions(SmartyGhost(1))),
+]
+
+
+def measure(operation, items, repeat):
+    """
+    Times an operation on a list of operands and measures its memory
+    allocations.
+
+    Return:
+    -------
+    - A dict with the number of operations per second (best of `repeat`
+    runs) and the bytes and memory blocks allocated per operation by the
+    results kept alive (including the list holding them, 8 bytes per
+    operation), measured with tracemalloc and sys.getallocatedblocks.
+    """
+
+    gc.collect()
+    gc.disable()
+    try:
+        best = np.inf
+        for r in range(repeat):
+            start = time.perf_counter()
+            operation(items)
+            best = min(best, time.perf_counter() - start)
+
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        results = operation(items)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        blocks = sys.getallocatedblocks() - blocks
+        del results
+    finally:
+        gc.enable()
+
+    return {'ops_per_sec': len(items) / best,
+            'bytes_per_op': size / len(items),
+            'blocks_per_op': blocks / len(items)}
+
+
+def runBenchmarks(layouts=None, numStates=1000, repeat=5, seed=0,
+                  names=None):
+    """
+    Runs the benchmarks on layouts.
+
+    Arguments:
+    ----------
+    - `layouts`: list of layout names, every layout of LAYOUT_DIRECTORY by
+                 default.
+    - `numStates`: number of operands of every benchmark.
+    - `repeat`: number of timed runs of every benchmark.
+    - `seed`: seed of the sampled states and operands.
+    - `names`: names of the benchmarks run, all of them by default.
+
+    Return:
+    -------
+    - A dict describing the environment ('python', 'numpy', 'machine' and
+    the settings) and holding the results under 'results', keyed by
+    '<layout>/<benchmark name>' (see measure).
+    """
+
+    if layouts is None:
+        layouts = sorted(os.path.splitext(os.path.basename(path))[0]
+                         for path in glob.glob(
+                             os.path.join(LAYOUT_DIRECTORY, '*.lay')))
+
+    results = dict()
+    maximumExpanded = GameState.maximumExpanded
+    GameState.setMaximumExpanded(np.inf)
+    try:
+        for name in layouts:
+            lay = layout.getLayout(os.path.join(LAYOUT_DIRECTORY, name))
+            rng = random.Random(seed)
+            samples = sampleStates(lay, numStates, rng)
+            hasGhost = samples[0][0].getNumAgents() > 1
+            for benchmark, needsGhost, items, operation in BENCHMARKS:
+                if names is not None and benchmark not in names:
+                    continue
+                if needsGhost and not hasGhost:
+                    continue
+                results['%s/%s' % (name, benchmark)] = measure(
+                    operation, items(samples, rng), repeat)
+    finally:
+        GameState.setMaximumExpanded(maximumExpanded)
+        GameState.resetNodeExpansionCounter()
+
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'numStates': numStates,
+            'repeat': repeat, 'seed': seed, 'results': results}
+
+
+def compare(report, baseline):
+    """
+    Given two reports of runBenchmarks, returns the list of the
+    (benchmark key, baseline ops/sec, ops/sec, speedup) tuples of the
+    benchmarks present in both.
+    """
+
+    rows = []
+    for key, result in sorted(report['results'].items()):
+        old = baseline['results'].get(key)
+        if old is not None:
+            rows.append((key, old['ops_per_sec'], result['ops_per_sec'],
+                         result['ops_per_sec'] / old['ops_per_sec']))
+    return rows
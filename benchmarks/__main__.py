@@ -0,0 +1,68 @@
+import json
+from argparse import ArgumentParser
+
+from benchmarks import BENCHMARKS, compare, runBenchmarks
+
+if __name__ == '__main__':
+    usage = """
+    USAGE:      python -m benchmarks <options>
+    EXAMPLES:   (1) python -m benchmarks --output baseline.json
+                    - runs every benchmark on every layout
+                (2) python -m benchmarks --layout small_adv
+                        --benchmark Grid.copy --baseline baseline.json
+                    - compares one benchmark to a stored baseline
+    """
+
+    parser = ArgumentParser(usage)
+    parser.add_argument(
+        '--layout',
+        help='Layouts the benchmarks run on (all of them by default).',
+        nargs='+', default=None)
+    parser.add_argument(
+        '--benchmark',
+        help='Benchmarks to run (all of them by default).',
+        choices=[benchmark[0] for benchmark in BENCHMARKS],
+        nargs='+', default=None)
+    parser.add_argument(
+        '--states',
+        help='Number of sampled states every benchmark runs on.',
+        type=int, default=1000)
+    parser.add_argument(
+        '--repeat',
+        help='Number of timed runs of every benchmark; the best one is '
+             'reported.',
+        type=int, default=5)
+    parser.add_argument('--seed', help='RNG seed', type=int, default=0)
+    parser.add_argument(
+        '--output',
+        help='JSON file the results are written to.',
+        default=None)
+    parser.add_argument(
+        '--baseline',
+        help='JSON file of earlier results to compare with.',
+        default=None)
+
+    args = parser.parse_args()
+
+    report = runBenchmarks(args.layout, args.states, args.repeat,
+                           args.seed, args.benchmark)
+
+    print('%-45s %14s %12s %12s' % ('benchmark', 'ops/sec', 'bytes/op',
+                                    'blocks/op'))
+    for key, result in sorted(report['results'].items()):
+        print('%-45s %14.0f %12.1f %12.2f' % (
+            key, result['ops_per_sec'], result['bytes_per_op'],
+            result['blocks_per_op']))
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        print('%-45s %14s %14s %8s' % ('benchmark', 'baseline', 'ops/sec',
+                                       'speedup'))
+        for key, old, new, speedup in compare(report, baseline):
+            print('%-45s %14.0f %14.0f %7.2fx' % (key, old, new, speedup))
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
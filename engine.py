@@ -0,0 +1,219 @@
+from transposition import TranspositionTable
+import numpy as np
+import time
+
+
+class SearchTimeout(Exception):
+    """
+    Raised to abandon an iteration of the search once the move deadline
+    or the node budget is exhausted.
+    """
+    pass
+
+
+class SearchEngine:
+    """
+    A depth-limited Principal Variation Search (NegaScout) over the game of
+    Pacman against one ghost.
+
+    The search is written in negamax form: values are seen from the agent
+    to move. The first son of a node is searched with the full window and
+    the others with a null window, re-searched with the full window when
+    they turn out to be better. Null windows assume integer values, which
+    holds for the game score and the heuristics of this repository.
+
+    Evaluation is pluggable: `evaluate(state)` returns the value of a leaf
+    for Pacman (e.g. the score plus `hminimax.PacmanAgent.PHeuristic`).
+    Move ordering is pluggable too: `orderMoves(state, sons, PacmanTurn,
+    ply)` returns the sons sorted best first. By default, sons are sorted
+    by a history heuristic. In both cases, the best move stored in the
+    transposition table is searched first.
+
+    A search may be abandoned by setting `deadline`: once it is over,
+    `search` raises `SearchTimeout`. Entries of the transposition
+    table are only stored for complete subtrees, so they stay valid.
+    """
+
+    def __init__(self, evaluate, table=None, orderMoves=None, ghostIndex=1):
+        """
+        Arguments:
+        ----------
+        - `evaluate`: function returning the value of a game state for
+                      Pacman.
+        - `table`: TranspositionTable shared by the searches, or None.
+        - `orderMoves`: move ordering function, or None for the history
+                        heuristic.
+        - `ghostIndex`: index of the ghost agent.
+        """
+        self.evaluate = evaluate
+        self.table = table
+        self.orderMoves = orderMoves
+        self.ghostIndex = ghostIndex
+        self.history = dict()  # (PacmanTurn, cell, move) -> cutoff score
+        self.nbNodes = 0
+        self.deadline = None  # Time after which searches are abandoned
+
+    def search(self, state, depth, PacmanTurn=True):
+        """
+        Given a game state and a depth, returns the value of the state for
+        Pacman and the best move of the agent to move.
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+        - `depth`: number of moves searched ahead.
+        - 'PacmanTurn': If True, Pacman is playing. Otherwise
+        the Ghost is playing.
+
+        Return:
+        -------
+        - A tuple (value, move).
+
+        Raises `SearchTimeout` once the deadline is over.
+        """
+
+        value, move = self.pvs(state, PacmanTurn, depth, -np.inf, np.inf, 0)
+        if not PacmanTurn:
+            value = -value
+        return value, move
+
+    def pvs(self, state, PacmanTurn, depth, alpha, beta, ply):
+        """
+        Given a game state, a player turn boolean, a depth and an alpha-beta
+        window, returns the value of the state for the agent to move and its
+        best move.
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+        - 'PacmanTurn': If True, Pacman is playing. Otherwise
+        the Ghost is playing.
+        - `depth`: number of moves searched ahead.
+        - 'alpha': lower bound of the window.
+        - 'beta': upper bound of the window.
+        - 'ply': number of moves between the root and `state`.
+
+        Return:
+        -------
+        - A tuple (value, move). A value outside of the window is only a
+        bound on the true value. The move is None at leaves.
+        """
+
+        sign = 1 if PacmanTurn else -1
+        if depth == 0 or state.isWin() or state.isLose():
+            return sign * self.evaluate(state), None
+
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SearchTimeout()
+
+        hashMove = None
+        if self.table is not None:
+            key = (PacmanTurn, state.zobrist())
+            entry = self.table.probe(key)
+            if entry is not None:
+                value, flag, draft, hashMove = entry[:4]
+                if draft >= depth:
+                    if flag == TranspositionTable.EXACT:
+                        return value, hashMove
+                    elif flag == TranspositionTable.LOWER:
+                        alpha = max(alpha, value)
+                    else:
+                        beta = min(beta, value)
+                    if alpha >= beta:
+                        return value, hashMove
+
+        window = (alpha, beta)
+        sons = self.successors(state, PacmanTurn)
+        if sons is None:  # Node expansion budget exhausted: use a leaf
+            return sign * self.evaluate(state), None
+        self.nbNodes += 1
+        sons = self.order(state, sons, PacmanTurn, ply, hashMove)
+
+        best = -np.inf
+        bestMove = sons[0][1]
+        for i, (son, move) in enumerate(sons):
+            if i == 0:
+                value = -self.pvs(son, not PacmanTurn, depth - 1,
+                                  -beta, -alpha, ply + 1)[0]
+            else:
+                # Prove that the son is not better than the best one
+                value = -self.pvs(son, not PacmanTurn, depth - 1,
+                                  -alpha - 1, -alpha, ply + 1)[0]
+                if alpha < value < beta:
+                    value = -self.pvs(son, not PacmanTurn, depth - 1,
+                                      -beta, -value, ply + 1)[0]
+
+            if value > best:
+                best = value
+                bestMove = move
+
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self.recordCutoff(state, move, PacmanTurn, depth)
+                break
+
+        if self.table is not None:
+            if best <= window[0]:
+                flag = TranspositionTable.UPPER
+            elif best >= window[1]:
+                flag = TranspositionTable.LOWER
+            else:
+                flag = TranspositionTable.EXACT
+            self.table.store(key, best, flag, depth, bestMove)
+
+        return best, bestMove
+
+    def successors(self, state, PacmanTurn):
+        """
+        Given a game state and a player turn boolean, returns the list of
+        (successor state, move) pairs of the agent to move.
+        """
+
+        if PacmanTurn:
+            return state.generatePacmanSuccessors()
+        return state.generateGhostSuccessors(self.ghostIndex)
+
+    def moverCell(self, state, PacmanTurn):
+        """
+        Given a game state and a player turn boolean, returns the cell of
+        the agent to move.
+        """
+
+        if PacmanTurn:
+            return state.getPacmanPosition()
+        return state.getGhostPosition(self.ghostIndex)
+
+    def order(self, state, sons, PacmanTurn, ply, hashMove):
+        """
+        Given a game state and its sons, returns the sons sorted by the
+        move ordering function, the move of the transposition table first.
+        """
+
+        if self.orderMoves is not None:
+            sons = self.orderMoves(state, sons, PacmanTurn, ply)
+        elif len(sons) > 1:
+            cell = self.moverCell(state, PacmanTurn)
+            sons = sorted(
+                sons, reverse=True,
+                key=lambda son: self.history.get((PacmanTurn, cell, son[1]),
+                                                 0))
+
+        if hashMove is not None:
+            sons = sorted(sons, key=lambda son: son[1] != hashMove)
+        return sons
+
+    def recordCutoff(self, state, move, PacmanTurn, depth):
+        """
+        Given a game state and the move that caused a cutoff, updates the
+        history table. Deeper cutoffs weigh more.
+        """
+
+        key = (PacmanTurn, self.moverCell(state, PacmanTurn), move)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+    def ageHistory(self):
+        """
+        Halves the history scores so that recent cutoffs weigh more.
+        """
+
+        self.history = {k: v // 2 for k, v in self.history.items() if v > 1}
@@ -0,0 +1,280 @@
+from pacman_module.game import Agent
+from pacman_module.ghostAgents import DumbyGhost, GreedyGhost, SmartyGhost
+from pacman_module.pacman import GameState
+from engine import SearchTimeout
+import hminimax
+import numpy as np
+import time
+
+# Ghost policies, by name of the `--ghostagent` argument
+GHOSTS = {'dumby': DumbyGhost, 'greedy': GreedyGhost, 'smarty': SmartyGhost}
+
+
+class PacmanAgent(Agent):
+
+    def __init__(self, args):
+        """
+        Arguments:
+        ----------
+        - `args`: Namespace of arguments from command-line prompt.
+        """
+        self.args = args
+        self.moveTime = getattr(args, 'movetime', 0.1)  # Seconds per move
+        # Fraction of the node expansion budget a move may use
+        self.nodeFraction = getattr(args, 'nodefraction', 0.9)
+        self.pruning = getattr(args, 'starpruning', 'star1')
+        # Model of the ghost, queried through its compiled policy
+        self.ghost = GHOSTS[getattr(args, 'ghostagent', 'greedy')](1)
+        # Leaves are evaluated with the heuristic of hminimax
+        self.heuristic = hminimax.PacmanAgent(args)
+
+    def registerInitialState(self, state):
+        """
+        Given the initial game state, compiles the policy of the ghost
+        model before the first move, whose time is limited.
+        """
+        self.policy = state.getGhostPolicy(self.ghost)
+
+    def get_action(self, state):
+        """
+        Given a pacman game state, returns a legal move.
+
+        The ghost moves at chance nodes, following the distribution of its
+        policy. The tree is searched with increasing depths until the move
+        deadline or the node budget is exhausted, and the best move of the
+        deepest search is returned.
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+
+        Return:
+        -------
+        - A legal move as defined in `game.Directions`.
+        """
+
+        self.heuristic.nbFood = state.getNumFood()  # Initial nb of dots
+        self.policy = state.getGhostPolicy(self.ghost)
+        self.deadline = time.time() + self.moveTime
+        self.nodeBudget = self.nodeFraction * GameState.maximumExpanded
+
+        sons = state.generatePacmanSuccessors()
+        best = sons[0][1]
+
+        depth = 1
+        while True:
+            self.abortable = depth > 1  # Always complete the first search
+            self.horizonReached = False
+            self.setBounds(state, depth)
+            sentinel = -np.inf
+            try:
+                for son in sons:
+                    val = self.expectimax(son[0], False, depth, sentinel,
+                                          np.inf)
+                    if val > sentinel:
+                        sentinel = val
+                        ret = son[1]
+            except SearchTimeout:
+                # The previous best move is searched first: the moves
+                # searched so far at this depth can be trusted
+                if sentinel > -np.inf:
+                    best = ret
+                break
+
+            best = ret
+            if not self.horizonReached:  # Deeper searches would be identical
+                break
+
+            # Search the principal variation first at the next depth
+            sons.sort(key=lambda son: son[1] != best)
+            depth += 1
+
+        return best
+
+    def expectimax(self, state, PacmanTurn, depth, alpha, beta):
+        """
+        Given a pacman game state, a player turn boolean, a depth value and
+        an alpha-beta window, returns the expectimax value of the state.
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+        - 'PacmanTurn': If True, Pacman is playing. Otherwise
+        the Ghost is playing.
+        - `depth`: number of moves searched ahead.
+        - 'alpha': lower bound of the window.
+        - 'beta': upper bound of the window.
+
+        Return:
+        -------
+        - The value of the state. A value outside of the window is only a
+        bound on the true value.
+        """
+
+        if self.abortable and (time.time() > self.deadline or
+                               GameState.countExpanded >= self.nodeBudget):
+            raise SearchTimeout()
+
+        if depth == 0 or state.isWin() or state.isLose():
+            if depth == 0 and not (state.isWin() or state.isLose()):
+                self.horizonReached = True
+            return self.evaluate(state)
+
+        if not PacmanTurn:
+            return self.chance(state, depth, alpha, beta)
+
+        sons = state.generatePacmanSuccessors()
+        if sons is None:  # Node expansion budget exhausted
+            raise SearchTimeout()
+
+        maxGameSum = -np.inf
+        for son in sons:
+            gameSum = self.expectimax(son[0], False, depth - 1, alpha, beta)
+            maxGameSum = max(maxGameSum, gameSum)
+
+            alpha = max(alpha, gameSum)
+            if alpha >= beta:
+                break
+
+        return maxGameSum
+
+    def chance(self, state, depth, alpha, beta):
+        """
+        Given a pacman game state where the ghost moves, a depth value and
+        an alpha-beta window, returns the expected value of the state.
+
+        Moves the ghost never plays are not searched. With Star1 pruning,
+        the search stops once the bounds on the values of the remaining
+        sons prove that the expected value lies outside of the window.
+        Star2 pruning first probes the sons by searching one of their own
+        sons, which gives tighter lower bounds and may prove a fail high,
+        but searches the probed sons twice.
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+        - `depth`: number of moves searched ahead.
+        - 'alpha': lower bound of the window.
+        - 'beta': upper bound of the window.
+
+        Return:
+        -------
+        - The expected value of the state. A value outside of the window
+        is only a bound on the true value.
+        """
+
+        sons = state.generateGhostSuccessors(1)
+        if sons is None:  # Node expansion budget exhausted
+            raise SearchTimeout()
+
+        distribution = self.ghostDistribution(state)
+        sons = [(son, distribution[move]) for son, move in sons
+                if distribution.get(move, 0) > 0]
+
+        if len(sons) == 1:  # Deterministic ghost move
+            return self.expectimax(sons[0][0], True, depth - 1, alpha, beta)
+
+        if self.pruning == 'none':
+            return sum([p * self.expectimax(son, True, depth - 1,
+                                            -np.inf, np.inf)
+                        for son, p in sons])
+
+        lower = [self.lower] * len(sons)  # Lower bounds of the sons values
+        if self.pruning == 'star2':
+            bound = self.lower  # Expected value of the lower bounds
+            for i, (son, p) in enumerate(sons):
+                sonBeta = (beta - bound + p * self.lower) / p
+                lower[i] = self.probe(son, depth - 1, sonBeta)
+                bound += p * (lower[i] - self.lower)
+                if bound >= beta:
+                    return bound
+
+        searched = 0.0  # Expected value over the searched sons
+        restProb = 1.0  # Probability of the sons left to search
+        restLower = sum([p * lower[i] for i, (son, p) in enumerate(sons)])
+        for i, (son, p) in enumerate(sons):
+            restProb -= p
+            restLower -= p * lower[i]
+            sonAlpha = max(self.lower,
+                           (alpha - searched - restProb * self.upper) / p)
+            sonBeta = min(self.upper, (beta - searched - restLower) / p)
+            searched += p * self.expectimax(son, True, depth - 1,
+                                            sonAlpha, sonBeta)
+
+            if searched + restProb * self.upper <= alpha:
+                return searched + restProb * self.upper  # Fail low
+            if searched + restLower >= beta:
+                return searched + restLower  # Fail high
+
+        return searched
+
+    def probe(self, state, depth, beta):
+        """
+        Given a pacman game state where Pacman moves, a depth value and an
+        upper bound, returns a lower bound of the value of the state, found
+        by searching its first son only.
+        """
+
+        if depth == 0 or state.isWin() or state.isLose():
+            return self.expectimax(state, True, depth, self.lower, beta)
+
+        sons = state.generatePacmanSuccessors()
+        if sons is None:  # Node expansion budget exhausted
+            raise SearchTimeout()
+
+        value = self.expectimax(sons[0][0], False, depth - 1, self.lower,
+                                beta)
+        # A fail low only proves the trivial lower bound
+        return max(self.lower, value)
+
+    def ghostDistribution(self, state):
+        """
+        Given a pacman game state, returns the distribution of the ghost
+        moves as a dict, looked up in the compiled ghost policy.
+        """
+
+        ghostState = state.getGhostState(1)
+        distribution = self.policy.distribution(
+            ghostState.getPosition(), ghostState.getDirection(),
+            ghostState.scaredTimer > 0, state.getPacmanPosition())
+        if distribution is None:  # Scared ghost between two cells
+            distribution = dict(self.ghost.getDistribution(state))
+
+        return distribution
+
+    def setBounds(self, state, depth):
+        """
+        Given the root game state and the search depth, sets the bounds of
+        the leaf values used by Star1 and Star2 pruning.
+        """
+
+        distances = state.getMazeDistances()
+        score = state.getScore()
+
+        # Time penalty, defeat and distance to a dot at worst
+        self.lower = score - depth - 500 - int(distances.matrix.max())
+        # Every dot (score and heuristic), ghost and victory at best: each
+        # ghost can be eaten once if it is scared at the root and once more
+        # after each capsule
+        ghostStates = state.getGhostStates()
+        eatableGhosts = len(ghostStates) * len(state.getCapsules()) + \
+            sum(1 for ghostState in ghostStates if ghostState.scaredTimer > 0)
+        self.upper = score + 110 * state.getNumFood() + \
+            200 * eatableGhosts + 500
+
+    def evaluate(self, state):
+        """
+        Given a game state, returns its value for Pacman.
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+
+        Return:
+        -------
+        - The score of the state plus the heuristic of hminimax, within
+        the bounds of the leaf values.
+        """
+
+        value = state.getScore() + self.heuristic.PHeuristic(state)
+        return min(max(value, self.lower), self.upper)
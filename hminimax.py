@@ -1,6 +1,15 @@
-
 from pacman_module.game import Agent
+from pacman_module.pacman import GameState
+from engine import SearchTimeout
+from parallel import RootSearchPool
 import numpy as np
+import time
+
+
+# Default deepest search. From depth 7 on, the minimax ghost can corner
+# Pacman in a dead end of large_adv: every line then looks lost and Pacman
+# no longer runs from the real ghost. Depths 5 and 6 win on all layouts.
+MAX_DEPTH = 6
 
 
 class PacmanAgent(Agent):
@@ -11,13 +20,24 @@ class PacmanAgent(Agent):
         ----------
         - `args`: Namespace of arguments from command-line prompt.
         """
-        self.distances = dict()
         self.args = args
+        self.moveTime = getattr(args, 'movetime', 0.1)  # Seconds per move
+        # Fraction of the node expansion budget a move may use
+        self.nodeFraction = getattr(args, 'nodefraction', 0.9)
+        # Deepest search, whatever the time left
+        self.maxDepth = getattr(args, 'maxdepth', MAX_DEPTH)
+        # Root subtrees are searched by worker processes if any
+        workers = getattr(args, 'workers', 0)
+        self.pool = RootSearchPool(self, workers) if workers > 0 else None
 
     def get_action(self, state):
         """
         Given a pacman game state, returns a legal move.
 
+        The tree is searched with increasing depths until the move deadline
+        or the node budget is exhausted, and the best move of the deepest
+        search is returned.
+
         Arguments:
         ----------
         - `state`: the current game state. 
@@ -28,17 +48,90 @@ class PacmanAgent(Agent):
         """
 
         self.nbFood = state.getNumFood()  # Initial nb of dots
+        self.deadline = time.time() + self.moveTime
+        self.nodeBudget = self.nodeFraction * GameState.maximumExpanded
 
         sons = state.generatePacmanSuccessors()
+        best = sons[0][1]
+
+        depth = 1
+        while True:
+            self.abortable = depth > 1  # Always complete the first search
+            self.horizonReached = False
+            values = self.searchSons(sons, depth)
+
+            # The previous best move is searched first: once its search is
+            # complete, the moves searched at this depth can be trusted
+            if values[0] is not None:
+                sentinel = -np.inf
+                for son, val in zip(sons, values):
+                    if val is not None and val > sentinel:
+                        sentinel = val
+                        best = son[1]
+
+            if None in values:  # Out of time or nodes
+                break
+            if depth == self.maxDepth:
+                break
+            if not self.horizonReached:  # Deeper searches would be identical
+                break
+
+            # Search the principal variation first at the next depth
+            sons.sort(key=lambda son: son[1] != best)
+            depth += 1
+
+        return best
 
-        sentinel = -np.inf
-        for son in sons:
-            val = self.hminimax(son[0], False, 3)
-            if val > sentinel:
-                sentinel = val
-                ret = son[1]
+    def searchSons(self, sons, depth):
+        """
+        Given the sons of the root and a depth value, searches the sons, in
+        worker processes in parallel mode.
 
-        return ret
+        Return:
+        -------
+        - The list of the values of the sons, None for the sons whose
+        search was abandoned once the deadline or the node budget was
+        exhausted.
+        """
+
+        if self.pool is not None:
+            results = self.pool.search(
+                [son[0] for son in sons],
+                [(depth, self.nbFood, self.deadline, self.abortable)] *
+                len(sons),
+                self.nodeBudget - GameState.countExpanded)
+            self.horizonReached = any(reached for val, reached in results)
+            return [val for val, reached in results]
+
+        values = [None] * len(sons)
+        try:
+            for i, son in enumerate(sons):
+                values[i] = self.hminimax(son[0], False, depth)
+        except SearchTimeout:
+            pass
+        return values
+
+    def searchRootSon(self, state, depth, nbFood, deadline, abortable):
+        """
+        Given a son of the root, a depth value and the search settings of
+        the root, searches the son within the node budget of the process.
+        Called by the worker processes in parallel mode (see parallel.py).
+
+        Return:
+        -------
+        - A tuple (value, horizonReached), the value being None if the
+        search was abandoned.
+        """
+
+        self.nbFood = nbFood
+        self.deadline = deadline
+        self.abortable = abortable
+        self.nodeBudget = GameState.maximumExpanded
+        self.horizonReached = False
+        try:
+            return self.hminimax(state, False, depth), self.horizonReached
+        except SearchTimeout:
+            return None, self.horizonReached
 
     def hminimax(self, state, PacmanTurn, depth):
         """
@@ -61,13 +154,21 @@ class PacmanAgent(Agent):
         - The number value return by the search of the tree.
         """
 
+        if self.abortable and (time.time() > self.deadline or
+                               GameState.countExpanded >= self.nodeBudget):
+            raise SearchTimeout()
+
         if depth == 0 or state.isWin() or state.isLose():
+            if depth == 0 and not (state.isWin() or state.isLose()):
+                self.horizonReached = True
             contributions = self.PHeuristic(state)
             return state.getScore() + contributions
 
         if PacmanTurn:
             maxGameSum = -np.inf
             sons = state.generatePacmanSuccessors()
+            if sons is None:  # Node expansion budget exhausted
+                raise SearchTimeout()
 
             for son in sons:
                 gameSum = self.hminimax(son[0], not PacmanTurn, depth - 1)
@@ -78,6 +179,8 @@ class PacmanAgent(Agent):
         else:
             minGameSum = np.inf
             sons = state.generateGhostSuccessors(1)
+            if sons is None:  # Node expansion budget exhausted
+                raise SearchTimeout()
 
             for son in sons:
                 gameSum = self.hminimax(son[0], not PacmanTurn, depth - 1)
@@ -108,103 +211,6 @@ class PacmanAgent(Agent):
 
         return - dist + foodEaten
 
-    def posFood(self, foods):
-        """
-        Given a food matrix, return the list of all dot positions according to
-        the matrix.
-
-        Arguments:
-        ----------
-        - `foods`: food matrix of the current game state.
-
-        Return:
-        -------
-        - List of tuples of 2 int value. (x, y)
-        """
-
-        foods_pos = []
-        for i in range(foods.width):
-            for j in range(foods.height):
-                if foods[i][j]:
-                    foods_pos.append((i, j))
-
-        return foods_pos
-
-    def getAdj(self, state):
-        """
-        Given a game state, returns the adjacent matrix of every tiles of the
-        labyrinth according to Pacman legal moves.
-
-        Arguments:
-        ----------
-        - `state`: A food matrix object.
-
-        Return:
-        -------
-        - List of List of (walls.width)*(walls.height) elements
-        """
-
-        walls = state.getWalls()
-
-        adj = list()
-        nb_elem = walls.height * walls.width
-        lsId = lambda i, j: i * walls.height + j  # give back number of
-        # the tile located in (i,j)
-
-        buff = [np.inf] * nb_elem  # buffer list to fill adj with inf elements
-        for i in range(nb_elem):
-            adj.append(buff.copy())
-
-        for i in range(walls.width):
-            for j in range(walls.height):
-                if not walls[i][j]:
-
-                    if not walls[i - 1][j]:  # left neighbor
-                        adj[lsId(i, j)][lsId(i - 1, j)] = 1
-
-                    if not walls[i + 1][j]:  # right neighbor
-                        adj[lsId(i, j)][lsId(i + 1, j)] = 1
-
-                    if not walls[i][j - 1]:  # up neighbor
-                        adj[lsId(i, j)][lsId(i, j - 1)] = 1
-
-                    if not walls[i][j + 1]:  # down neighbor
-                        adj[lsId(i, j)][lsId(i, j + 1)] = 1
-
-        return adj
-
-    def floydWarshall(self, adj):
-        """
-        Given a adjacent matrix, returns a distance matrix generated by the 
-        Floyd-Warshall algorithm.
-
-        Arguments:
-        ----------
-        - `adj`: adjacent matrix of the current game state. 
-
-        Return:
-        -------
-        - A distance matrix.
-        """
-
-        # Number of vertices in the adjacent matrix
-        v = len(adj)
-
-        for k in range(v):
-
-            # pick all vertices as source one by one
-            for i in range(v):
-
-                # Pick all vertices as destination for the
-                # above picked source
-                for j in range(v):
-
-                    # If vertex k is on the shortest path from
-                    # i to j, then update the value of adj[i][j]
-                    adj[i][j] = min(adj[i][j], adj[i][k] + adj[k][j])
-
-        return adj
-
     def getMinDist(self, state):
         """
         Given a game state, returns the shortest distance between Pacman and
@@ -219,26 +225,12 @@ class PacmanAgent(Agent):
         - The shortest distance between Pacman and a dot.
         """
 
-        walls = state.getWalls()
-
-        lsId = lambda i, j: i * walls.height + j
-
-        # See if distance matrix already computed for the given maze
-        dist = self.distances.get(walls, False)
-
-        if not dist:
-            dist = self.distances[walls] = self.floydWarshall(
-                self.getAdj(state))
+        foods = state.getFood().asList()
+        if len(foods) == 0:
+            return 0
 
-        ret = list()
+        # Maze distances are computed once per layout and shared
+        distances = state.getMazeDistances()
         pacmanPos = state.getPacmanPosition()
-        foods = self.posFood(state.getFood())
-
-        for food in foods:
-            ret.append(dist[lsId(pacmanPos[0], pacmanPos[1])]
-                       [lsId(food[0], food[1])])
 
-        if len(ret) == 0:
-            return 0
-        else:
-            return min(ret)
+        return min(distances.distance(pacmanPos, food) for food in foods)
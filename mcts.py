@@ -0,0 +1,235 @@
+from pacman_module.game import Agent, popcount
+from pacman_module.pacman import GameState
+from pacman_module.simulator import getSimulator
+from pacman_module.util import agentRandom
+from expectimax import GHOSTS
+import numpy as np
+import time
+
+
+WIN_POINTS = 500  # Score bonus of a win (see PacmanRules)
+
+
+class Node:
+    """
+    A node of the search tree: a game state, the statistics of the
+    rollouts played through it and, once expanded, its sons as
+    [move, node, probability] lists (the probability of the ghost move at
+    ghost nodes, 1 at Pacman nodes).
+    """
+    __slots__ = ('state', 'PacmanTurn', 'sons', 'visits', 'total')
+
+    def __init__(self, state, PacmanTurn):
+        self.state = state
+        self.PacmanTurn = PacmanTurn
+        self.sons = None
+        self.visits = 0
+        self.total = 0.0
+
+
+class PacmanAgent(Agent):
+
+    def __init__(self, args):
+        """
+        Arguments:
+        ----------
+        - `args`: Namespace of arguments from command-line prompt.
+        """
+        self.args = args
+        self.moveTime = getattr(args, 'movetime', 0.1)  # Seconds per move
+        # Fraction of the node expansion budget a move may use
+        self.nodeFraction = getattr(args, 'nodefraction', 0.9)
+        self.exploration = getattr(args, 'exploration', 20)
+        self.rolloutDepth = getattr(args, 'rolloutdepth', 50)
+        # Stream of Pacman in the game played with the seed
+        self.random = agentRandom(getattr(args, 'seed', 1), 0)
+        # Model of the ghost, queried through its compiled policy
+        self.ghost = GHOSTS[getattr(args, 'ghostagent', 'greedy')](1)
+        self.root = None  # Subtree kept from the previous move
+
+    def registerInitialState(self, state):
+        """
+        Given the initial game state, builds the compiled policy of the
+        ghost model and the rollout simulator of the layout before the
+        first move, whose time is limited.
+        """
+        self.policy = state.getGhostPolicy(self.ghost)
+        self.simulator = getSimulator(state.data.layout)
+
+    def get_action(self, state):
+        """
+        Given a pacman game state, returns a legal move.
+
+        Monte Carlo Tree Search (UCT) is run until the move deadline or the
+        node budget is exhausted. The tree is expanded with the successor
+        functions of GameState and leaves are evaluated by rollouts on the
+        lightweight simulator (see simulator.py). The subtree of the move
+        played is kept for the next move.
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+
+        Return:
+        -------
+        - A legal move as defined in `game.Directions`.
+        """
+
+        self.policy = state.getGhostPolicy(self.ghost)
+        self.simulator = getSimulator(state.data.layout)
+        self.nbFood = state.getNumFood()  # Dots at the root
+        deadline = time.time() + self.moveTime
+        nodeBudget = self.nodeFraction * GameState.maximumExpanded
+
+        root = self.findRoot(state)
+        self.expand(root)
+        if len(root.sons) > 1:
+            while time.time() < deadline and \
+                    GameState.countExpanded < nodeBudget:
+                self.iterate(root)
+
+        move, node, p = max(root.sons, key=lambda son: son[1].visits)
+        self.root = node
+        return move
+
+    def findRoot(self, state):
+        """
+        Given the current game state, returns the node of the kept subtree
+        reached by the last ghost move, or a new node.
+        """
+
+        if self.root is not None and self.root.sons is not None:
+            key = state.zobrist()
+            for move, node, p in self.root.sons:
+                if node.state.zobrist() == key:
+                    return node
+        return Node(state, True)
+
+    def iterate(self, root):
+        """
+        Given the root node, selects a leaf, expands it if it was already
+        evaluated, evaluates it by a rollout and updates the statistics of
+        the nodes on the way.
+        """
+
+        node = root
+        path = [node]
+        while node.sons is not None and node.sons:
+            node = self.select(node)
+            path.append(node)
+
+        if node.visits > 0 and self.expand(node):
+            node = self.select(node)
+            path.append(node)
+
+        value = self.evaluate(node)
+        for node in path:
+            node.visits += 1
+            node.total += value
+
+    def select(self, node):
+        """
+        Given an expanded node, returns the son to explore: at Pacman nodes,
+        an unexplored son or the son with the best upper confidence bound;
+        at ghost nodes, a son drawn from the ghost policy.
+        """
+
+        if not node.PacmanTurn:
+            r = self.random.random()
+            for move, son, p in node.sons:
+                r -= p
+                if r < 0:
+                    return son
+            return son
+
+        for move, son, p in node.sons:
+            if son.visits == 0:
+                return son
+
+        logVisits = np.log(node.visits)
+        bestBound = -np.inf
+        for move, son, p in node.sons:
+            bound = son.total / son.visits + \
+                self.exploration * np.sqrt(logVisits / son.visits)
+            if bound > bestBound:
+                best = son
+                bestBound = bound
+        return best
+
+    def expand(self, node):
+        """
+        Given a node, generates its sons if it has not been expanded yet.
+        Ghost moves the ghost never plays are left out.
+
+        Return:
+        -------
+        - True if the node has sons.
+        """
+
+        if node.sons is None:
+            state = node.state
+            if node.PacmanTurn:
+                sons = state.generatePacmanSuccessors()
+                if sons is None:  # Node expansion budget exhausted
+                    return False
+                node.sons = [[move, Node(son, False), 1.0]
+                             for son, move in sons]
+            else:
+                sons = state.generateGhostSuccessors(1)
+                if sons is None:  # Node expansion budget exhausted
+                    return False
+                distribution = self.ghostDistribution(state)
+                node.sons = [[move, Node(son, True), distribution[move]]
+                             for son, move in sons
+                             if distribution.get(move, 0) > 0]
+        return len(node.sons) > 0
+
+    def evaluate(self, node):
+        """
+        Given a node, returns the score of a rollout played from its state,
+        or the score of the state if the game is over.
+
+        A rollout cut before the end of the game is also credited with a
+        share of the win bonus for each dot eaten since the root, and
+        charged the distance from Pacman to the closest dot. Otherwise,
+        the few points of a dot do not make up for the risk of passing a
+        ghost, and Pacman hides in dead ends (e.g. in large_adv against
+        dumby).
+        """
+
+        state = node.state
+        if state.isWin() or state.isLose():
+            return state.getScore()
+
+        score, over, cell, food = self.simulator.rollout(
+            state, 0 if node.PacmanTurn else 1, [None, self.policy],
+            self.rolloutDepth, self.random)
+        if over:
+            return score
+
+        eaten = self.nbFood - popcount(food)
+        height = state.data.layout.height
+        distances = state.getMazeDistances()
+        dist = np.inf
+        while food:
+            bit = food & -food
+            i = bit.bit_length() - 1
+            dist = min(dist, distances.distance(cell, (i // height,
+                                                       i % height)))
+            food ^= bit
+        return score - dist + WIN_POINTS * eaten / self.nbFood
+
+    def ghostDistribution(self, state):
+        """
+        Given a pacman game state, returns the distribution of the ghost
+        moves as a dict, looked up in the compiled ghost policy.
+        """
+
+        ghostState = state.getGhostState(1)
+        distribution = self.policy.distribution(
+            ghostState.getPosition(), ghostState.getDirection(),
+            ghostState.scaredTimer > 0, state.getPacmanPosition())
+        if distribution is None:  # Scared ghost between two cells
+            distribution = dict(self.ghost.getDistribution(state))
+
+        return distribution
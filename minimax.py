@@ -1,7 +1,13 @@
 
 from pacman_module.game import Agent
+from parallel import RootSearchPool
+from transposition import TranspositionTable
 import numpy as np
 
+# Number of bits of the sets of contexts kept with transposition table
+# entries (see storeResult)
+CONTEXT_BITS = 1024
+
 
 class PacmanAgent(Agent):
 
@@ -12,6 +18,12 @@ class PacmanAgent(Agent):
         - `args`: Namespace of arguments from command-line prompt.
         """
         self.args = args
+        # Kept across moves since values are stored relative to the score
+        self.table = TranspositionTable(getattr(args, 'ttsize', 2 ** 18))
+        self.nbNodes = 0
+        # Root subtrees are searched by worker processes if any
+        workers = getattr(args, 'workers', 0)
+        self.pool = RootSearchPool(self, workers) if workers > 0 else None
 
     def get_action(self, state):
         """
@@ -29,31 +41,49 @@ class PacmanAgent(Agent):
         """
 
         sons = state.generatePacmanSuccessors()
+        rootKey = self.generateKey(state, True)
 
-        sentinel = -np.inf
+        if self.pool is not None:
+            values = self.pool.search([son[0] for son in sons],
+                                      [(rootKey,)] * len(sons))
+        else:
+            values = [self.searchRootSon(son[0], rootKey) for son in sons]
 
-        for son in sons:
-            val = self.minimax(son[0], False,
-                               {self.generateKey(state, True)})
+        sentinel = -np.inf
+        for son, val in zip(sons, values):
             if val > sentinel:
                 sentinel = val
                 ret = son[1]
 
         return ret
 
-    def minimax(self, state, PacmanTurn, visited):
+    def searchRootSon(self, state, rootKey):
+        """
+        Given a son of the root and the context key of the root, returns
+        the value of the son. Called by the worker processes in parallel
+        mode (see parallel.py).
+        """
+
+        self.cycleCut = False
+        self.contexts = 0
+        return self.minimax(state, False, {rootKey},
+                            self.contextBit(rootKey))
+
+    def minimax(self, state, PacmanTurn, visited, path):
         """
-        Given a pacman game state, a player turn boolean and
-        a set of visited nodes, returns the value returned by 
-        the corresponding minimax tree.
+        Given a pacman game state, a player turn boolean and the visited
+        nodes, returns the value returned by the corresponding minimax
+        tree.
 
         Arguments:
         ----------
         - `state`: the current game state. 
         - 'PacmanTurn': If True, Pacman is playing. Otherwise
         the Ghost is playing.
-        -'visited': set of context treated in the active branch of
-        the tree to avoid cycles. 
+        -'visited': set of the contexts treated in the active branch of
+        the tree, to avoid cycles. The context of `state` is added on
+        entry and removed on exit.
+        - 'path': bit set of the contexts of `visited` (see contextBit).
 
         Return:
         -------
@@ -64,7 +94,21 @@ class PacmanAgent(Agent):
             return state.getScore()  # Game over, return the result
 
         key = self.generateKey(state, PacmanTurn)
+        ttKey = self.tableKey(state, PacmanTurn)
+        entry = self.table.probe(ttKey)
+        # Subtree already solved from another path, which it cannot cut
+        if entry is not None and not entry[4] & path:
+            self.contexts |= entry[4]
+            return state.getScore() + entry[0]
+
         visited.add(key)  # the context is being visited
+        self.nbNodes += 1
+        nbNodes = self.nbNodes
+        outerCut = self.cycleCut
+        outerContexts = self.contexts
+        self.cycleCut = False
+        self.contexts = 0
+        path |= self.contextBit(key)
 
         if PacmanTurn:
             maxGameSum = -np.inf
@@ -72,18 +116,23 @@ class PacmanAgent(Agent):
             sons = state.generatePacmanSuccessors()
             for son in sons:
                 key_son = self.generateKey(son[0], not PacmanTurn)
+                self.contexts |= self.contextBit(key_son)
 
                 if key_son in visited:  # If son context already visited
+                    self.cycleCut = True
                     continue
 
-                gameSum = self.minimax(son[0], not PacmanTurn, visited.copy())
+                gameSum = self.minimax(son[0], not PacmanTurn, visited,
+                                       path)
                 maxGameSum = max(maxGameSum, gameSum)
 
              # Ignore the node if it has no sons and it is not final
             if maxGameSum == -np.inf:
-                return np.inf
+                maxGameSum = np.inf
 
-            return maxGameSum
+            visited.remove(key)  # the context leaves the active branch
+            return self.storeResult(state, ttKey, maxGameSum, nbNodes,
+                                    outerCut, outerContexts)
 
         else:
             minGameSum = np.inf
@@ -91,18 +140,69 @@ class PacmanAgent(Agent):
             sons = state.generateGhostSuccessors(1)
             for son in sons:
                 key_son = self.generateKey(son[0], not PacmanTurn)
+                self.contexts |= self.contextBit(key_son)
 
                 if key_son in visited:  # If son context already visited
+                    self.cycleCut = True
                     continue
 
-                gameSum = self.minimax(son[0], not PacmanTurn, visited.copy())
+                gameSum = self.minimax(son[0], not PacmanTurn, visited,
+                                       path)
                 minGameSum = min(minGameSum, gameSum)
 
             # Ignore the node if it has no sons and it is not final
             if minGameSum == np.inf:
-                return -np.inf
+                minGameSum = -np.inf
+
+            visited.remove(key)  # the context leaves the active branch
+            return self.storeResult(state, ttKey, minGameSum, nbNodes,
+                                    outerCut, outerContexts)
 
-            return minGameSum
+    def storeResult(self, state, ttKey, value, nbNodes, outerCut,
+                    outerContexts):
+        """
+        Given a searched game state and its value, stores the value in the
+        transposition table if it does not depend on the path to the
+        state, then returns it.
+
+        Sons whose context is in the active branch are cut, so the value
+        of a state depends on the path to it. A value found without any
+        cut in the subtree is stored along with the set of the contexts
+        tested in the subtree: it is reused under another path if none of
+        these contexts is on that path, since the search would then be
+        the same. Sets of contexts are kept as bit sets (see contextBit),
+        in which false positives only make entries unused.
+
+        Arguments:
+        ----------
+        - `state`: the searched game state.
+        - `ttKey`: transposition table key of `state`.
+        - `value`: the value found by the search of `state`.
+        - `nbNodes`: node counter when `state` was entered.
+        - `outerCut`: whether a cycle was cut before `state` was entered.
+        - `outerContexts`: contexts tested before `state` was entered.
+
+        Return:
+        -------
+        - `value`.
+        """
+
+        if not self.cycleCut:
+            self.table.store(ttKey, value - state.getScore(),
+                             TranspositionTable.EXACT,
+                             self.nbNodes - nbNodes + 1,
+                             contexts=self.contexts)
+        self.cycleCut = outerCut or self.cycleCut
+        self.contexts |= outerContexts
+
+        return value
+
+    def contextBit(self, key):
+        """
+        Given a context, returns its bit in the bit sets of contexts.
+        """
+
+        return 1 << (hash(key) % CONTEXT_BITS)
 
     def generateKey(self, state, PacmanTurn):
         """
@@ -117,37 +217,30 @@ class PacmanAgent(Agent):
 
         Return:
         -------
-        - List of int value. (x1, y1, x2, y2, ...)
+        - A tuple (PacmanTurn, x1, y1, x2, y2, Zobrist hash of the dots)
         """
 
         pacmanPos = state.getPacmanPosition()
         ghostPos = state.getGhostPosition(1)
-        foods = state.getFood()
-
-        ret = [PacmanTurn, pacmanPos[0], pacmanPos[
-            1], int(ghostPos[0]), int(ghostPos[1])]
-
-        ret.extend(self.posFood(foods))
 
-        return tuple(ret)
+        return (PacmanTurn, pacmanPos[0], pacmanPos[1],
+                int(ghostPos[0]), int(ghostPos[1]), state.boardZobrist())
 
-    def posFood(self, foods):
+    def tableKey(self, state, PacmanTurn):
         """
-        Given a food matrix, return the list of all dot positions according to
-        the matrix.
+        Given a game state and a player turn boolean, returns the
+        transposition table key of the state. Unlike `generateKey`, it
+        accounts for the ghost direction which restricts its legal moves.
 
         Arguments:
         ----------
-        - `food`: A food matrix object.
+        - `state`: the current game state. 
+        - 'PacmanTurn': If True, Pacman is playing. Otherwise the Ghost 
+        is playing.
 
         Return:
         -------
-        - List of int value. (x1, y1, x2, y2, ...)
+        - A tuple (PacmanTurn, Zobrist hash of the state).
         """
-        foods_pos = []
-        for i in range(foods.width):
-            for j in range(foods.height):
-                if foods[i][j]:
-                    foods_pos.extend([i, j])
 
-        return foods_pos
+        return (PacmanTurn, state.zobrist())
@@ -0,0 +1,95 @@
+# distances.py
+# ------------
+# All-pairs maze distances, computed once per layout and shared by every
+# agent (Pacman or ghost) playing on it.
+
+from collections import deque
+import weakref
+
+import numpy as np
+
+from .util import nearestPoint
+
+# Maze distance oracles, keyed by layout identity
+_ORACLES = weakref.WeakKeyDictionary()
+
+UNREACHABLE = -1
+
+
+class MazeDistances:
+    """
+    Shortest path lengths between every pair of open cells of a layout.
+
+    Distances are computed by a breadth-first search from every open cell
+    and stored in a NumPy int16 matrix indexed by open cells only; walls
+    are not represented. Unreachable pairs hold UNREACHABLE in the matrix
+    and are reported as an infinite distance. For layouts loaded from a
+    file, the matrix is persisted in the layout cache.
+    """
+
+    def __init__(self, layout):
+        self.cells = sorted(layout.adjacency.keys())
+        self.index = dict((cell, i) for i, cell in enumerate(self.cells))
+        if layout.cache is None:
+            self.matrix = self.computeMatrix(layout.adjacency)
+        else:
+            n = len(self.cells)
+            self.matrix = layout.cache.get(
+                'distances', lambda: self.computeMatrix(layout.adjacency),
+                (n, n))
+
+    def computeMatrix(self, adjacency):
+        n = len(self.cells)
+        matrix = np.full((n, n), UNREACHABLE, dtype=np.int16)
+        neighbors = [[self.index[c] for c in adjacency[cell]]
+                     for cell in self.cells]
+        for source in range(n):
+            row = matrix[source]
+            row[source] = 0
+            fringe = deque([source])
+            while fringe:
+                i = fringe.popleft()
+                d = row[i] + 1
+                for j in neighbors[i]:
+                    if row[j] == UNREACHABLE:
+                        row[j] = d
+                        fringe.append(j)
+        return matrix
+
+    def indexOf(self, pos):
+        """
+        Returns the matrix index of a position, rounded to the nearest
+        cell for agents standing between two cells.
+        """
+        i = self.index.get(pos)
+        if i is None:
+            i = self.index[nearestPoint(pos)]
+        return i
+
+    def distance(self, a, b):
+        """
+        Returns the maze distance between positions a and b.
+        """
+        d = self.matrix[self.indexOf(a), self.indexOf(b)]
+        if d == UNREACHABLE:
+            return np.inf
+        return int(d)
+
+    def distances_from(self, a):
+        """
+        Returns the read-only row of distances from position a to every
+        open cell, ordered as `cells`.
+        """
+        row = self.matrix[self.indexOf(a)]
+        row.flags.writeable = False
+        return row
+
+
+def getMazeDistances(layout):
+    """
+    Returns the MazeDistances of a layout, building it on first use.
+    """
+    oracle = _ORACLES.get(layout)
+    if oracle is None:
+        oracle = _ORACLES[layout] = MazeDistances(layout)
+    return oracle
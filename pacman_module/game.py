@@ -21,8 +21,11 @@
 # For more info, see http://inst.eecs.berkeley.edu/~cs188/sp09/pacman.html
 
 from .util import *
+from array import array
+import numpy as np
 import time
 import os
+import random
 import traceback
 import sys
 import pacman_module as pacmodule
@@ -50,6 +53,10 @@ class Agent:
         """
         raiseNotDefined()
 
+    # A trusted agent observes the live game state, made read-only, instead
+    # of a copy (see Game.run)
+    trusted = False
+
     def register_initial_state(self, state):
         """
         The Agent will receive a GameState (from either {pacman, capture, sonar}.py) and
@@ -88,6 +95,7 @@ class Configuration:
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
     """
+    __slots__ = ('pos', 'direction')
 
     def __init__(self, pos, direction):
         self.pos = pos
@@ -132,10 +140,24 @@ class Configuration:
         return Configuration((x + dx, y + dy), direction)
 
 
+def readOnlySetattr(self, name, value):
+    raise AttributeError('Cannot modify a read-only game state')
+
+
+class ReadOnlyConfiguration(Configuration):
+    """
+    A Configuration of a read-only game state (see GameState.freeze).
+    """
+    __slots__ = ()
+    __setattr__ = readOnlySetattr
+
+
 class AgentState:
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer',
+                 'numCarrying', 'numReturned')
 
     def __init__(self, startConfiguration, isPacman):
         self.start = startConfiguration
@@ -176,11 +198,25 @@ class AgentState:
         return self.configuration.getDirection()
 
 
+class ReadOnlyAgentState(AgentState):
+    """
+    An AgentState of a read-only game state (see GameState.freeze). Its
+    copies are writable.
+    """
+    __slots__ = ()
+    __setattr__ = readOnlySetattr
+
+
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
-    via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
-    y vertical and the origin (0,0) in the bottom left corner.
+    A 2-dimensional array of booleans backed by a single integer bitboard.
+    Data is accessed via grid[x][y] where (x,y) are positions on a Pacman
+    map with x horizontal, y vertical and the origin (0,0) in the bottom
+    left corner. Cell (x,y) is bit x * height + y of the bitboard.
+
+    Since Python integers are immutable, copies share the bitboard until one
+    of them is written to (copy-on-write), counting is a popcount and
+    hashing is the hash of a single integer.
 
     The __str__ method constructs an output that is oriented like a pacman board.
     """
@@ -197,19 +233,39 @@ class Grid:
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(
-            height)] for x in range(width)]
+        self.frozen = False
+        self.bits = (1 << (width * height)) - 1 if initialValue else 0
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
     def __getitem__(self, i):
-        return self.data[i]
+        if i < 0:
+            i += self.width
+        if i < 0 or i >= self.width:
+            raise IndexError('Grid index out of range')
+        return GridColumn(self, i)
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        for y, value in enumerate(item):
+            self.set(key, y, value)
+
+    def get(self, x, y):
+        """
+        Returns the value of cell (x,y), without building a column view.
+        """
+        return (self.bits >> (x * self.height + y)) & 1 == 1
+
+    def set(self, x, y, value):
+        if self.frozen:
+            raise Exception('Cannot modify a frozen Grid')
+        bit = 1 << (x * self.height + y)
+        if value:
+            self.bits |= bit
+        else:
+            self.bits &= ~bit
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)]
+        out = [[str(self.get(x, y))[0] for x in range(self.width)]
                for y in range(self.height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
@@ -217,41 +273,48 @@ class Grid:
     def __eq__(self, other):
         if other is None:
             return False
-        return self.data == other.data
+        return self.bits == other.bits and self.height == other.height \
+            and self.width == other.width
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        return hash(self.bits)
 
     def copy(self):
-        g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g = Grid.__new__(Grid)
+        g.CELLS_PER_INT = self.CELLS_PER_INT
+        g.width = self.width
+        g.height = self.height
+        g.frozen = False
+        g.bits = self.bits
         return g
 
+    def freeze(self):
+        """
+        Makes the grid read-only. Copies of a frozen grid are writable.
+        """
+        self.frozen = True
+
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
-        return g
+        return self.copy()
 
     def count(self, item=True):
-        return sum([x.count(item) for x in self.data])
+        n = popcount(self.bits)
+        if item:
+            return n
+        return self.width * self.height - n
 
     def asList(self, key=True):
+        bits = self.bits
+        if not key:
+            bits ^= (1 << (self.width * self.height)) - 1
         list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key:
-                    list.append((x, y))
+        while bits:
+            low = bits & -bits
+            list.append(divmod(low.bit_length() - 1, self.height))
+            bits ^= low
         return list
 
     def packBits(self):
@@ -274,7 +337,7 @@ class Grid:
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
-        x = index / self.height
+        x = index // self.height
         y = index % self.height
         return x, y
 
@@ -305,6 +368,42 @@ class Grid:
         return bools
 
 
+class GridColumn:
+    """
+    A view on column x of a Grid, so that grid[x][y] reads and writes the
+    bitboard of the grid.
+    """
+    __slots__ = ('grid', 'x')
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+
+    def __len__(self):
+        return self.grid.height
+
+    def __getitem__(self, y):
+        height = self.grid.height
+        if y < 0:
+            y += height
+        if y < 0 or y >= height:
+            raise IndexError('Grid index out of range')
+        return (self.grid.bits >> (self.x * height + y)) & 1 == 1
+
+    def __setitem__(self, y, value):
+        if y < 0:
+            y += self.grid.height
+        self.grid.set(self.x, y, value)
+
+
+if hasattr(int, 'bit_count'):
+    def popcount(bits):
+        return bits.bit_count()
+else:
+    def popcount(bits):
+        return bin(bits).count('1')
+
+
 def reconstituteGrid(bitRep):
     if not isinstance(bitRep, type((1, 2))):
         return bitRep
@@ -316,6 +415,37 @@ def reconstituteGrid(bitRep):
 ####################################
 
 
+class Zobrist:
+    """
+    Random 64-bit keys for the components of a game state. The Zobrist hash
+    of a state is the XOR of the keys of its components, so that a move
+    updates it by XOR-ing out the old components and XOR-ing in the new ones.
+
+    Keys are drawn lazily from a fixed seed, so hashes are reproducible
+    across runs and processes.
+    """
+    _keys = {}
+    _random = random.Random(0x5eed)
+
+    def key(component):
+        """
+        Returns the key of a hashable component, e.g. ('food', x, y).
+        """
+        k = Zobrist._keys.get(component)
+        if k is None:
+            k = Zobrist._keys[component] = Zobrist._random.getrandbits(64)
+        return k
+    key = staticmethod(key)
+
+    def agentKey(index, agentState):
+        config = agentState.configuration
+        k = Zobrist.key(('agent', index, config.pos, config.direction))
+        if agentState.scaredTimer:
+            k ^= Zobrist.key(('scared', index, agentState.scaredTimer))
+        return k
+    agentKey = staticmethod(agentKey)
+
+
 class Actions:
     """
     A collection of static methods for manipulating move actions.
@@ -374,7 +504,7 @@ class Actions:
             dx, dy = vec
             next_y = y_int + dy
             next_x = x_int + dx
-            if not walls[next_x][next_y]:
+            if not walls.get(next_x, next_y):
                 possible.append(dir)
 
         return possible
@@ -393,7 +523,7 @@ class Actions:
             next_y = y_int + dy
             if next_y < 0 or next_y == walls.height:
                 continue
-            if not walls[next_x][next_y]:
+            if not walls.get(next_x, next_y):
                 neighbors.append((next_x, next_y))
         return neighbors
     getLegalNeighbors = staticmethod(getLegalNeighbors)
@@ -407,20 +537,32 @@ class Actions:
 
 class GameStateData:
     """
-
+    The data of a game state. A successor shares the food grid, the capsule
+    list and the agent states of its predecessor; they are copied only when
+    the successor modifies them (see getMutableAgentState).
     """
+    __slots__ = ('food', 'capsules', 'agentStates', 'layout', '_eaten',
+                 'score', '_zobrist', '_boardZobrist', '_ownedAgents',
+                 '_foodEaten', '_foodAdded', '_capsuleEaten', '_agentMoved',
+                 '_lose', '_win', 'scoreChange')
 
     def __init__(self, prevState=None):
         """
-        Generates a new data packet by copying information from its predecessor.
+        Generates a new data packet sharing information with its predecessor.
         """
         if prevState is not None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates(prevState.agentStates)
+            self.food = prevState.food
+            self.capsules = prevState.capsules
+            self.agentStates = list(prevState.agentStates)
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._zobrist = prevState._zobrist
+            self._boardZobrist = prevState._boardZobrist
+        else:
+            self._zobrist = None
+            self._boardZobrist = None
+        self._ownedAgents = 0  # Bit i is set once agent i has been copied
 
         self._foodEaten = None
         self._foodAdded = None
@@ -433,6 +575,10 @@ class GameStateData:
     def deepCopy(self):
         state = GameStateData(self)
         state.food = self.food.deepCopy()
+        state.capsules = list(self.capsules)
+        state.agentStates = self.copyAgentStates(self.agentStates)
+        state._ownedAgents = (1 << len(state.agentStates)) - 1
+        state._eaten = list(self._eaten)
         state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
@@ -440,6 +586,85 @@ class GameStateData:
         state._capsuleEaten = self._capsuleEaten
         return state
 
+    def freeze(self):
+        """
+        Makes the data read-only, in place: its grids, sequences, agent
+        states and configurations cannot be modified any more. Successors
+        stay writable, since they copy whatever they modify.
+        """
+        self.zobrist()  # Computed lazily, so computed before freezing
+        self.food.freeze()
+        self.capsules = tuple(self.capsules)
+        self._eaten = tuple(self._eaten)
+        for agentState in self.agentStates:  # Some may be frozen already
+            for configuration in (agentState.start, agentState.configuration):
+                if type(configuration) is Configuration:
+                    configuration.__class__ = ReadOnlyConfiguration
+            if type(agentState) is AgentState:
+                agentState.__class__ = ReadOnlyAgentState
+        self.agentStates = tuple(self.agentStates)
+        self.__class__ = ReadOnlyGameStateData
+
+    def zobrist(self):
+        """
+        Returns the 64-bit Zobrist hash of the agent states, food and
+        capsules, computing it from scratch only when it is unknown.
+        """
+        if self._zobrist is None:
+            h = self.boardZobrist()
+            for index, agentState in enumerate(self.agentStates):
+                h ^= Zobrist.agentKey(index, agentState)
+            self._zobrist = h
+        return self._zobrist
+
+    def boardZobrist(self):
+        """
+        Returns the 64-bit Zobrist hash of the food and capsules only.
+        """
+        if self._boardZobrist is None:
+            h = 0
+            for x, y in self.food.asList():
+                h ^= Zobrist.key(('food', x, y))
+            for x, y in self.capsules:
+                h ^= Zobrist.key(('capsule', x, y))
+            self._boardZobrist = h
+        return self._boardZobrist
+
+    def updateZobrist(self, prevState):
+        """
+        Derives the Zobrist hash of this successor from the hash of its
+        predecessor by XOR-ing out and in the components that changed.
+        """
+        board = prevState.boardZobrist()
+        if self._foodEaten is not None:
+            board ^= Zobrist.key(('food',) + tuple(self._foodEaten))
+        if self._capsuleEaten is not None:
+            board ^= Zobrist.key(('capsule',) + tuple(self._capsuleEaten))
+
+        h = prevState.zobrist() ^ prevState.boardZobrist() ^ board
+        for index, agentState in enumerate(self.agentStates):
+            prev = prevState.agentStates[index]
+            if prev is agentState:
+                continue
+            if prev.configuration != agentState.configuration or \
+                    prev.scaredTimer != agentState.scaredTimer:
+                h ^= Zobrist.agentKey(index, prev)
+                h ^= Zobrist.agentKey(index, agentState)
+        self._boardZobrist = board
+        self._zobrist = h
+
+    def getMutableAgentState(self, index):
+        """
+        Returns the state of agent `index`, copying it first if it is still
+        shared with the predecessor. Rules must use it before modifying an
+        agent state.
+        """
+        bit = 1 << index
+        if not self._ownedAgents & bit:
+            self.agentStates[index] = self.agentStates[index].copy()
+            self._ownedAgents |= bit
+        return self.agentStates[index]
+
     def copyAgentStates(self, agentStates):
         copiedStates = []
         for agentState in agentStates:
@@ -467,37 +692,18 @@ class GameStateData:
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate(self.agentStates):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                # hash(state)
-        return int(
-            (hash(
-                tuple(
-                    self.agentStates)) +
-                13 *
-                hash(
-                self.food) +
-                113 *
-                hash(
-                tuple(
-                    self.capsules)) +
-                7 *
-                hash(
-                self.score)) %
-            1048575)
+        return hash(self.zobrist())
 
     def __str__(self):
         width, height = self.layout.width, self.layout.height
-        map = Grid(width, height)
+        map = [[' ' for y in range(height)] for x in range(width)]
         if isinstance(self.food, type((1, 2))):
             self.food = reconstituteGrid(self.food)
         for x in range(width):
             for y in range(height):
                 food, walls = self.food, self.layout.walls
-                map[x][y] = self._foodWallStr(food[x][y], walls[x][y])
+                map[x][y] = self._foodWallStr(food.get(x, y),
+                                              walls.get(x, y))
 
         for agentState in self.agentStates:
             if agentState is None:
@@ -514,7 +720,10 @@ class GameStateData:
         for x, y in self.capsules:
             map[x][y] = 'o'
 
-        return str(map) + ("\nScore: %d\n" % self.score)
+        out = [''.join([map[x][y] for x in range(width)])
+               for y in range(height)]
+        out.reverse()
+        return '\n'.join(out) + ("\nScore: %d\n" % self.score)
 
     def _foodWallStr(self, hasFood, hasWall):
         if hasFood:
@@ -549,10 +758,12 @@ class GameStateData:
         """
         self.food = layout.food.copy()
         #self.capsules = []
-        self.capsules = layout.capsules[:]
+        self.capsules = list(layout.capsules)
         self.layout = layout
         self.score = 0
         self.scoreChange = 0
+        self._zobrist = None
+        self._boardZobrist = None
 
         self.agentStates = []
         numGhosts = 0
@@ -571,6 +782,17 @@ class GameStateData:
         self._eaten = [False for a in self.agentStates]
 
 
+class ReadOnlyGameStateData(GameStateData):
+    """
+    The data of a read-only game state (see GameStateData.freeze).
+    """
+    __slots__ = ()
+    __setattr__ = readOnlySetattr
+
+    def freeze(self):
+        pass
+
+
 try:
     import boinc
     _BOINC_ENABLED = True
@@ -578,10 +800,72 @@ except BaseException:
     _BOINC_ENABLED = False
 
 
+class MoveMetrics:
+    """
+    Per-move records of the agents of a game: the index of the agent, the
+    wall time and CPU time of its get_action call, the number of nodes it
+    expanded and whether it violated the node expansion budget. Columns
+    are stored in typed arrays (see the `array` module) and copied into
+    NumPy arrays by `column`.
+    """
+    COLUMNS = (('agent', 'b'), ('wallTime', 'd'), ('cpuTime', 'd'),
+               ('nodes', 'q'), ('violated', 'b'))
+
+    def __init__(self):
+        self.columns = dict((name, array(code))
+                            for name, code in MoveMetrics.COLUMNS)
+
+    def __len__(self):
+        return len(self.columns['agent'])
+
+    def append(self, agent, wallTime, cpuTime, nodes, violated):
+        columns = self.columns
+        columns['agent'].append(agent)
+        columns['wallTime'].append(wallTime)
+        columns['cpuTime'].append(cpuTime)
+        columns['nodes'].append(nodes)
+        columns['violated'].append(violated)
+
+    def column(self, name, agent=None):
+        """
+        Returns a copy of a column as a NumPy array, restricted to the
+        moves of an agent if one is given. A view of the typed array would
+        forbid further appends while it is alive.
+        """
+        values = np.array(self.columns[name],
+                          dtype=self.columns[name].typecode)
+        if agent is None:
+            return values
+        return values[self.column('agent') == agent]
+
+    def summary(self):
+        """
+        Returns a dict mapping every agent index to the statistics of its
+        moves: number of moves and budget violations, and the p50, p95
+        and max of the wall time, CPU time and expanded nodes per move,
+        e.g. 'wallTime_p95'.
+        """
+        summary = dict()
+        for agent in np.unique(self.column('agent')):
+            stats = {'moves': int(np.sum(self.column('agent') == agent)),
+                     'violations': int(self.column('violated', agent).sum())}
+            for name in ('wallTime', 'cpuTime', 'nodes'):
+                values = self.column(name, agent)
+                p50, p95 = np.percentile(values, (50, 95))
+                stats[name + '_p50'] = float(p50)
+                stats[name + '_p95'] = float(p95)
+                stats[name + '_max'] = float(values.max())
+            summary[int(agent)] = stats
+        return summary
+
+
 class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
     """
+    # If True, also checks that trusted agents leave their read-only
+    # observation unchanged, e.g. did not unfreeze its food grid
+    checkTrusted = False
 
     def __init__(
             self,
@@ -600,6 +884,7 @@ class Game:
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
         self.moveHistory = []
+        self.metrics = MoveMetrics()
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
@@ -644,10 +929,19 @@ class Game:
     def run(self):
         """
         Main control loop for game play.
+
+        Every move is recorded in self.metrics (see MoveMetrics). Returns
+        the final score, and the computation time and expanded nodes of
+        Pacman (agent 0) over the game.
         """
         self.display.initialize(self.state.data)
         self.numMoves = 0
 
+        # Agents may prepare for the game outside of their move time
+        for agent in self.agents:
+            if 'registerInitialState' in dir(agent):
+                agent.registerInitialState(self.state.deepCopy())
+
         agentIndex = self.startingIndex
         numAgents = len(self.agents)
         previous_action = Directions.STOP
@@ -661,8 +955,15 @@ class Game:
             agent = self.agents[agentIndex]
             move_time = 0
             skip_action = False
-            # Generate an observation of the state
-            observation = self.state.deepCopy()
+            # Generate an observation of the state: trusted agents share
+            # the live state, made read-only
+            trusted = getattr(agent, 'trusted', False)
+            if trusted:
+                observation = self.state.freeze()
+                if Game.checkTrusted:
+                    fingerprint = self.state.pack()
+            else:
+                observation = self.state.deepCopy()
 
             # Solicit an action
             action = None
@@ -670,6 +971,7 @@ class Game:
             pacmodule.pacman.GameState.resetNodeExpansionCounter()
             violated = False
             t = time.time()
+            cpu = time.process_time()
             if expout == 0:
                 action = agent.get_action(observation)
             else:
@@ -677,8 +979,17 @@ class Game:
                 action = agent.get_action(observation)
                 if pacmodule.pacman.GameState.countExpanded > expout:
                     violated = True
-            totalComputationTime += (time.time() - t)
-            totalExpandedNodes += pacmodule.pacman.GameState.countExpanded
+            move_time = time.time() - t
+            expanded = pacmodule.pacman.GameState.countExpanded
+            if trusted and Game.checkTrusted and \
+                    self.state.pack() != fingerprint:
+                raise Exception('Agent %d modified its trusted observation'
+                                % agentIndex)
+            self.metrics.append(agentIndex, move_time,
+                                time.process_time() - cpu, expanded, violated)
+            if agentIndex == 0:  # Ghost agents are not accounted for
+                totalComputationTime += move_time
+                totalExpandedNodes += expanded
             if action not in self.state.getLegalActions(agentIndex):
                 print("Illegal move !")
                 action = previous_action
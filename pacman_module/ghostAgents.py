@@ -17,21 +17,30 @@ from .game import Agent
 from .game import Actions
 from .game import Directions
 from .util import manhattanDistance
-from .util import PriorityQueue
 from . import util
-import numpy as np
+import random
 
 
 class GhostAgent(Agent):
+    # Moves are drawn from the global generator until the ghost is seeded
+    rng = random
+
     def __init__(self, index):
         self.index = index
 
+    def seed(self, seed):
+        """
+        Draws the moves of the ghost from its own stream of the game played
+        with a seed (see util.agentRandom).
+        """
+        self.rng = util.agentRandom(seed, self.index)
+
     def get_action(self, state):
         dist = self.getDistribution(state)
         if len(dist) == 0:
             return Directions.STOP
         else:
-            return util.chooseFromDistribution(dist)
+            return util.chooseFromDistribution(dist, self.rng)
 
     def getDistribution(self, state):
         """Returns a Counter encoding a distribution
@@ -41,6 +50,7 @@ class GhostAgent(Agent):
 
 class DumbyGhost(GhostAgent):
     "A dumb ghost."
+    trusted = True  # Only reads the game state
 
     def getDistribution(self, state):
         dist = util.Counter()
@@ -63,6 +73,7 @@ class DumbyGhost(GhostAgent):
 
 class GreedyGhost(GhostAgent):
     "A greedy ghost."
+    trusted = True  # Only reads the game state
 
     def __init__(self, index, prob_attack=1.0, prob_scaredFlee=1.0):
         self.index = index
@@ -115,111 +126,30 @@ class GreedyGhost(GhostAgent):
 
 class SmartyGhost(GhostAgent):
     """A smart ghost"""
+    trusted = True  # Only reads the game state
 
     def __init__(self, index):
         self.index = index
-        self.fscore = None
-        self.gscore = None
         self.wasScared = False
-        self.corners = None
         self.gghost = GreedyGhost(index)
 
-    def _pathsearch(self, state, fscore_in, gscore_in, goal):
-        fringe = PriorityQueue()
-        closed = np.full(
-            (state.data.layout.width,
-             state.data.layout.height),
-            False)
-        initpos = tuple(map(lambda x: int(x),
-                            state.getGhostPosition(self.index)))
-        if gscore_in is not None:
-            gscore = gscore_in
-        else:
-            gscore = np.full(
-                (state.data.layout.width, state.data.layout.height), np.inf)
-            gscore[initpos] = 0
-        if fscore_in is not None:
-            fscore = fscore_in
-        else:
-            fscore = np.full(
-                (state.data.layout.width, state.data.layout.height), np.inf)
-            fscore[initpos] = manhattanDistance(goal, initpos)
-        fringe.push((state, [], closed), fscore[initpos])
-        openset = np.full(
-            (state.data.layout.width, state.data.layout.height), False)
-        openset[initpos] = True
-        while not fringe.isEmpty():
-            _, node = fringe.pop()
-            curNode, actions, closed = node
-            if curNode.getGhostPosition(self.index) == goal:
-                return actions[0], fscore, gscore
-            closed = np.copy(closed)
-            ghostpos = tuple(
-                map(lambda x: int(x), curNode.getGhostPosition(self.index)))
-            closed[ghostpos] = True
-            openset[ghostpos] = False
-            succs = [(curNode.generateSuccessor(self.index, action), action)
-                     for action in curNode.getLegalActions(self.index)]
-
-            for succNode in succs:
-                action = succNode[1]
-                succNode = succNode[0]
-
-                succghostpos = tuple(
-                    map(lambda x: int(x),
-                        succNode.getGhostPosition(self.index)))
-                tentative_gscore = gscore[succghostpos] + 1
-                tentative_fscore = tentative_gscore + \
-                    manhattanDistance(goal, succghostpos)
-
-                if closed[succghostpos]:
-                    if tentative_fscore <= fscore[succghostpos]:
-                        closed[succghostpos] = False
-                    else:
-                        continue
-
-                if not openset[succghostpos]:
-                    openset[succghostpos] = True
-                elif tentative_gscore >= gscore[succghostpos]:
-                    continue
-
-                gscore[succghostpos] = tentative_gscore
-                fscore[succghostpos] = tentative_fscore
-                fringe.push(
-                    (succNode,
-                     actions + [action],
-                        closed),
-                    fscore[succghostpos])
-        return actions[0], fscore, gscore
-
     def getDistribution(self, state):
-        if self.corners is None:
-            self.corners = [
-                (1,
-                 1),
-                (1,
-                 state.data.layout.height),
-                (state.data.layout.width,
-                 1),
-                (state.data.layout.width,
-                 state.data.layout.height)]
         ghostState = state.getGhostState(self.index)
         isScared = ghostState.scaredTimer > 0
         dist = util.Counter()
         legalActions = state.getLegalActions(self.index)
         for a in legalActions:
             dist[a] = 0
-        ghostpos = state.getGhostPosition(self.index)
-        goal = state.getPacmanPosition() if not isScared \
-            else self.corners[
-            np.argmax(list(map(lambda pos:
-                               manhattanDistance(pos,
-                                                 ghostpos),
-                               self.corners)))
-        ]
         if not isScared:
-            a, self.fscore, self.gscore = self._pathsearch(
-                state, self.fscore, self.gscore, goal)
+            # Follow a shortest path towards Pacman, using the maze
+            # distances shared by all agents instead of a search per move
+            distances = state.getMazeDistances()
+            goal = state.getPacmanPosition()
+            ghostpos = state.getGhostPosition(self.index)
+            pathLengths = [
+                distances.distance(Actions.getSuccessor(ghostpos, a), goal)
+                for a in legalActions]
+            a = legalActions[pathLengths.index(min(pathLengths))]
             dist[a] = 1
         else:
             dist = self.gghost.getDistribution(state)
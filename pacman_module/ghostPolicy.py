@@ -0,0 +1,149 @@
+# ghostPolicy.py
+# --------------
+# Ghost policies compiled into per-layout lookup tables, so that agents
+# modelling a ghost during their search do not run its code at every node.
+
+import hashlib
+import inspect
+import weakref
+
+import numpy as np
+
+from .game import Configuration, Directions
+
+# Compiled policies, keyed by layout identity then by policy name
+_POLICIES = weakref.WeakKeyDictionary()
+
+# Hashes of the code of ghost agent classes (see policyCode)
+_CODES = dict()
+
+# Table axes for the ghost direction and its actions
+DIRECTIONS = (Directions.NORTH, Directions.SOUTH, Directions.EAST,
+              Directions.WEST, Directions.STOP)
+ACTIONS = DIRECTIONS[:4]
+
+
+def policyCode(ghostClass):
+    """
+    Returns a hash of the code of a ghost agent class and of its bases, so
+    that editing a policy invalidates its cached tables.
+    """
+    code = _CODES.get(ghostClass)
+    if code is not None:
+        return code
+    digest = hashlib.sha1()
+    for cls in ghostClass.__mro__[:-1]:  # All but object
+        try:
+            digest.update(inspect.getsource(cls).encode())
+        except (OSError, TypeError):  # Source unavailable
+            for name, member in sorted(vars(cls).items()):
+                memberCode = getattr(member, '__code__', None)
+                if memberCode is not None:
+                    digest.update(name.encode() + memberCode.co_code)
+    code = _CODES[ghostClass] = digest.hexdigest()[:16]
+    return code
+
+
+def policyName(ghost):
+    """
+    Returns a name identifying the policy of a ghost agent: its module and
+    class, a hash of their code and the values of its probability
+    parameters.
+    """
+    ghostClass = type(ghost)
+    params = ['%s=%r' % (k, v) for k, v in sorted(vars(ghost).items())
+              if isinstance(v, float)]
+    return '-'.join(['policy', ghostClass.__module__, ghostClass.__name__,
+                     policyCode(ghostClass)] + params)
+
+
+class GhostPolicy:
+    """
+    The action distributions of a ghost policy on a layout, for every
+    (ghost cell, ghost direction, scared status, Pacman cell) context.
+
+    Distributions are computed once with the getDistribution method of the
+    ghost agent and stored in a NumPy array indexed by open cells (as in
+    MazeDistances), which is persisted in the layout cache. Queries are
+    turned into dicts of the actions with a non-zero probability and
+    memoized. Scared ghosts move at half speed and may stand between two
+    cells: these contexts are not compiled.
+    """
+
+    def __init__(self, state, ghost):
+        """
+        Arguments:
+        ----------
+        - `state`: a game state on the layout, used as a template to
+                   evaluate the ghost policy.
+        - `ghost`: the GhostAgent whose policy is compiled.
+        """
+        layout = state.data.layout
+        self.cells = sorted(layout.adjacency.keys())
+        self.index = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.distributions = dict()
+
+        n = len(self.cells)
+        shape = (n, len(DIRECTIONS), 2, n, len(ACTIONS))
+
+        def compute():
+            return self.computeTable(state, ghost)
+
+        if layout.cache is None:
+            self.table = compute()
+        else:
+            self.table = layout.cache.get(policyName(ghost), compute, shape)
+
+    def computeTable(self, template, ghost):
+        n = len(self.cells)
+        table = np.zeros((n, len(DIRECTIONS), 2, n, len(ACTIONS)))
+        state = template.deepCopy()
+        state.data._win = state.data._lose = False
+        pacmanState = state.data.agentStates[0]
+        ghostState = state.data.agentStates[ghost.index]
+        for g, ghostCell in enumerate(self.cells):
+            for d, direction in enumerate(DIRECTIONS):
+                ghostState.configuration = Configuration(ghostCell, direction)
+                for scared in (0, 1):
+                    ghostState.scaredTimer = scared
+                    for p, pacmanCell in enumerate(self.cells):
+                        pacmanState.configuration = Configuration(
+                            pacmanCell, Directions.STOP)
+                        row = table[g, d, scared, p]
+                        dist = ghost.getDistribution(state)
+                        for a, action in enumerate(ACTIONS):
+                            row[a] = dist[action]
+        return table
+
+    def distribution(self, ghostPos, ghostDirection, scared, pacmanPos):
+        """
+        Returns the distribution of the ghost actions in a context, as a
+        dict mapping the actions with a non-zero probability to their
+        probability, or None if the context is not compiled.
+        """
+        key = (ghostPos, ghostDirection, scared, pacmanPos)
+        dist = self.distributions.get(key)
+        if dist is None:
+            g = self.index.get(ghostPos)
+            p = self.index.get(pacmanPos)
+            if g is None or p is None:
+                return None
+            row = self.table[g, DIRECTIONS.index(ghostDirection),
+                             int(scared), p]
+            dist = dict((action, float(row[a]))
+                        for a, action in enumerate(ACTIONS) if row[a] > 0)
+            self.distributions[key] = dist
+        return dist
+
+
+def getGhostPolicy(state, ghost):
+    """
+    Returns the compiled policy of a ghost agent on the layout of a game
+    state, compiling it on first use.
+    """
+    policies = _POLICIES.setdefault(state.data.layout, dict())
+    name = policyName(ghost)
+    policy = policies.get(name)
+    if policy is None:
+        policy = policies[name] = GhostPolicy(state, ghost)
+    return policy
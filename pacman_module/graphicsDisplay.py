@@ -176,7 +176,16 @@ class InfoPane:
 
 
 class PacmanGraphics:
-    def __init__(self, zoom=1.0, frameTime=0.0, capture=False):
+    def __init__(self, zoom=1.0, frameTime=0.0, capture=False, renderEvery=1,
+                 finalOnly=False):
+        """
+          Playback is set by `frameTime`, the duration of the animation of
+          a move (0 for none, negative to step through the game with the
+          keyboard), `renderEvery`, to draw only one update out of N
+          (fast-forward), and `finalOnly`, to draw only the final state of
+          the game. Unless every move is animated, the canvas is refreshed
+          once per drawn update instead of at every step of the drawing.
+        """
         self.have_window = 0
         self.currentGhostImages = {}
         self.pacmanImage = None
@@ -184,6 +193,12 @@ class PacmanGraphics:
         self.gridSize = DEFAULT_GRID_SIZE * zoom
         self.capture = capture
         self.frameTime = frameTime
+        self.renderEvery = renderEvery
+        self.finalOnly = finalOnly
+        self.numUpdates = 0
+        self.pendingState = None
+        self.eatenFood = []
+        self.eatenCapsules = []
 
     def checkNullDisplay(self):
         return False
@@ -255,9 +270,32 @@ class PacmanGraphics:
         else:
             image = self.drawGhost(newState, agentIndex)
             self.agentImages[agentIndex] = (newState, image)
-        refresh()
+        self.refreshFrame()
+
+    def batchesUpdates(self):
+        return self.frameTime == 0 or self.renderEvery > 1 or self.finalOnly
+
+    def refreshFrame(self):
+        """
+          Refreshes the canvas, unless updates are batched (see update).
+        """
+        if not self.batchesUpdates():
+            refresh()
 
     def update(self, newState):
+        if self.renderEvery > 1 or self.finalOnly:
+            # Skipped updates are drawn at once by the next drawn one
+            if newState._foodEaten is not None:
+                self.eatenFood.append(newState._foodEaten)
+            if newState._capsuleEaten is not None:
+                self.eatenCapsules.append(newState._capsuleEaten)
+            self.numUpdates += 1
+            if self.finalOnly or self.numUpdates % self.renderEvery:
+                self.pendingState = newState
+            else:
+                self.redraw(newState)
+            return
+
         agentIndex = newState._agentMoved
         agentState = newState.agentStates[agentIndex]
 
@@ -277,6 +315,38 @@ class PacmanGraphics:
         self.infoPane.updateScore(newState.score)
         if 'ghostDistances' in dir(newState):
             self.infoPane.updateGhostDistances(newState.ghostDistances)
+        if self.batchesUpdates():
+            refresh()
+
+    def redraw(self, newState):
+        """
+          Draws a state without animation: moves every agent to its
+          position and removes the food and capsules eaten since the last
+          drawn update.
+        """
+        for agentIndex, agentState in enumerate(newState.agentStates):
+            if self.agentImages[agentIndex][0].isPacman != \
+                    agentState.isPacman:
+                self.swapImages(agentIndex, agentState)
+            prevState, prevImage = self.agentImages[agentIndex]
+            if agentState.isPacman:
+                self.movePacman(self.getPosition(agentState),
+                                self.getDirection(agentState), prevImage)
+            else:
+                self.moveGhost(agentState, agentIndex, prevState, prevImage)
+            self.agentImages[agentIndex] = (agentState, prevImage)
+
+        for cell in self.eatenFood:
+            self.removeFood(cell, self.food)
+        for cell in self.eatenCapsules:
+            self.removeCapsule(cell, self.capsules)
+        self.eatenFood = []
+        self.eatenCapsules = []
+        self.pendingState = None
+        self.infoPane.updateScore(newState.score)
+        if 'ghostDistances' in dir(newState):
+            self.infoPane.updateGhostDistances(newState.ghostDistances)
+        refresh()
 
     def make_window(self, width, height):
         grid_width = (width - 1) * self.gridSize
@@ -329,7 +399,7 @@ class PacmanGraphics:
         endpoints = self.getEndpoints(direction, position)
         r = PACMAN_SCALE * self.gridSize
         moveCircle(image[0], screenPosition, r, endpoints)
-        refresh()
+        self.refreshFrame()
 
     def animatePacman(self, pacman, prevPacman, image):
         if self.frameTime < 0:
@@ -353,7 +423,7 @@ class PacmanGraphics:
                 self.getPosition(pacman),
                 self.getDirection(pacman),
                 image)
-        refresh()
+        self.refreshFrame()
 
     def getGhostColor(self, ghost, ghostIndex):
         if ghost.scaredTimer > 0:
@@ -471,7 +541,7 @@ class PacmanGraphics:
 
         for ghostImagePart in ghostImageParts:
             move_by(ghostImagePart, delta)
-        refresh()
+        self.refreshFrame()
 
         if ghost.scaredTimer > 0:
             color = SCARED_COLOR
@@ -481,7 +551,7 @@ class PacmanGraphics:
         self.moveEyes(self.getPosition(ghost),
                       self.getDirection(ghost),
                       ghostImageParts[-4:])
-        refresh()
+        self.refreshFrame()
 
     def getPosition(self, agentState):
         if agentState.configuration is None:
@@ -494,6 +564,8 @@ class PacmanGraphics:
         return agentState.configuration.getDirection()
 
     def finish(self):
+        if self.pendingState is not None:
+            self.redraw(self.pendingState)
         end_graphics()
 
     def to_screen(self, point):
@@ -14,8 +14,10 @@
 
 from .util import manhattanDistance
 from .game import Grid
+from .layoutCache import LayoutCache
 import os
 import random
+import types
 from functools import reduce
 
 VISIBILITY_MATRIX_CACHE = {}
@@ -24,9 +26,17 @@ VISIBILITY_MATRIX_CACHE = {}
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are immutable once built: their grids are frozen, their
+    sequences are tuples and their attributes cannot be reassigned. Game
+    states and observations therefore share a single Layout object.
+
+    Layouts loaded from a file carry a LayoutCache (see layoutCache.py)
+    through which per-layout precomputations are persisted on disk.
     """
 
-    def __init__(self, layoutText):
+    def __init__(self, layoutText, cache=None):
+        self.cache = cache
         self.width = len(layoutText[0])
         self.height = len(layoutText)
         self.walls = Grid(self.width, self.height, False)
@@ -35,15 +45,68 @@ class Layout:
         self.agentPositions = []
         self.numGhosts = 0
         self.processLayoutText(layoutText)
-        self.layoutText = layoutText
+        self.layoutText = tuple(layoutText)
         self.totalFood = len(self.food.asList())
+        self.adjacency = self.computeAdjacency()
+        self.pacmanActions, self.ghostActions = self.computeLegalActions()
         # self.initializeVisibilityMatrix()
 
+        self.walls.freeze()
+        self.food.freeze()
+        self.capsules = tuple(self.capsules)
+        self.agentPositions = tuple(self.agentPositions)
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError('Layouts are immutable')
+        object.__setattr__(self, name, value)
+
+    def computeAdjacency(self):
+        """
+        Returns a read-only dict mapping every open cell to the tuple of its open
+        neighbours, in the order of Actions.getLegalNeighbors (without the
+        cell itself).
+        """
+        from .game import Actions
+        adjacency = {}
+        for x in range(self.width):
+            for y in range(self.height):
+                if not self.walls.get(x, y):
+                    adjacency[(x, y)] = tuple(
+                        n for n in Actions.getLegalNeighbors((x, y), self.walls)
+                        if n != (x, y))
+        return types.MappingProxyType(adjacency)
+
+    def computeLegalActions(self):
+        """
+        Returns two read-only dicts of legal action tuples: the first maps
+        every open cell to the legal actions of Pacman, the second maps
+        every (open cell, current direction) pair to the legal actions of a
+        ghost, following PacmanRules and GhostRules. They are rebuilt with
+        every layout, which is as fast as loading them from the layout
+        cache (see layoutCache.py).
+        """
+        from .game import Actions, Configuration, Directions
+        pacmanActions = {}
+        ghostActions = {}
+        for cell in self.adjacency:
+            possible = Actions.getPossibleActions(
+                Configuration(cell, Directions.STOP), self.walls)
+            pacmanActions[cell] = tuple(possible)
+            for direction in Actions._directions:
+                actions = [a for a in possible if a != Directions.STOP]
+                reverse = Actions.reverseDirection(direction)
+                if reverse in actions and len(actions) > 1:
+                    actions.remove(reverse)
+                ghostActions[(cell, direction)] = tuple(actions)
+        return (types.MappingProxyType(pacmanActions),
+                types.MappingProxyType(ghostActions))
+
     def getNumGhosts(self):
         return self.numGhosts
 
     def initializeVisibilityMatrix(self):
-        global VISIBILITY_MATRIX_CACHE
         if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
             from .game import Directions
             vecs = [(-0.5, 0), (0.5, 0), (0, -0.5), (0, 0.5)]
@@ -106,7 +169,13 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        # Layouts are immutable, so they can be shared instead of copied
+        return self
+
+    def __reduce__(self):
+        # The legal action tables are read-only mappings, which cannot be
+        # pickled: layouts are rebuilt from their text
+        return (Layout, (list(self.layoutText), self.cache))
 
     def processLayoutText(self, layoutText):
         """
@@ -166,8 +235,10 @@ def getLayout(name, back=2):
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)):
         return None
-    f = open(fullname)
+    f = open(fullname, 'rb')
     try:
-        return Layout([line.strip() for line in f])
+        content = f.read()
     finally:
         f.close()
+    return Layout([line.strip() for line in content.decode().splitlines()],
+                  LayoutCache.forContent(content))
@@ -0,0 +1,110 @@
+# layoutCache.py
+# --------------
+# Persistent on-disk cache for per-layout precomputation (maze distances,
+# compiled ghost policies), so that short-lived processes playing on the
+# same layouts do not pay for it every time.
+#
+# The legal action tables of Layout are not cached: they are rebuilt in
+# about 1.5ms on large.lay, while loading them from .npy files and turning
+# them back into dicts of tuples takes about as long.
+#
+# Arrays are stored as .npy files under
+#     <cache directory>/<format version>-<SHA-1 of the .lay file>/<name>.npy
+# and loaded as read-only memory maps. The cache directory is
+# $PACMAN_CACHE_DIR, or $XDG_CACHE_HOME/pacman_module (~/.cache/pacman_module
+# by default). Setting PACMAN_CACHE_DIR to an empty string disables it.
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# Bump when the layout of a cached array changes
+CACHE_FORMAT = 1
+
+
+def getCacheDirectory():
+    """
+    Returns the cache directory, or None if caching is disabled.
+    """
+    directory = os.environ.get('PACMAN_CACHE_DIR')
+    if directory is not None:
+        return directory or None
+    base = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'pacman_module')
+
+
+class LayoutCache:
+    """
+    The cached arrays of one layout file, identified by a hash of its
+    content. Arrays are only read or computed when first requested.
+    """
+
+    def __init__(self, contentHash, directory):
+        self.contentHash = contentHash
+        self.directory = os.path.join(
+            directory, '%d-%s' % (CACHE_FORMAT, contentHash))
+
+    def forContent(content):
+        """
+        Returns the cache of a layout file given its raw content (bytes),
+        or None if caching is disabled.
+        """
+        directory = getCacheDirectory()
+        if directory is None:
+            return None
+        return LayoutCache(hashlib.sha1(content).hexdigest(), directory)
+    forContent = staticmethod(forContent)
+
+    def path(self, name):
+        return os.path.join(self.directory, name + '.npy')
+
+    def load(self, name):
+        """
+        Returns the cached array `name` as a read-only memory map, or None
+        if it is missing or unreadable.
+        """
+        try:
+            return np.load(self.path(name), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def store(self, name, array):
+        """
+        Writes array `name` to the cache. Concurrent writers are safe since
+        the file is written aside then atomically renamed. Failures (e.g.
+        read-only file systems) are ignored: the cache is an optimization.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, array)
+                os.replace(tmp, self.path(name))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            pass
+
+    def get(self, name, compute, shape=None):
+        """
+        Returns array `name`, loading it from the cache or computing and
+        storing it on a miss. A cached array with an unexpected shape is
+        treated as a miss.
+
+        Arguments:
+        ----------
+        - `name`: name of the array within the layout cache.
+        - `compute`: function without argument returning the array.
+        - `shape`: expected shape of the array, if known.
+        """
+        array = self.load(name)
+        if array is not None and (shape is None or array.shape == shape):
+            return array
+        array = compute()
+        self.store(name, array)
+        return array
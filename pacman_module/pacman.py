@@ -43,10 +43,14 @@ from .game import GameStateData
 from .game import Game
 from .game import Directions
 from .game import Actions
+from .game import Configuration
+from .game import readOnlySetattr
 from .util import nearestPoint
 from .util import manhattanDistance
 from . import textDisplay, graphicsDisplay
 from . import util, layout
+from .distances import getMazeDistances
+from .ghostPolicy import getGhostPolicy
 import sys
 import types
 import time
@@ -72,6 +76,7 @@ class GameState:
 
     Note that in classic Pacman, Pacman is always agent 0.
     """
+    __slots__ = ('data',)
 
     ####################################################
     # Accessor methods: use these to access state data #
@@ -117,21 +122,30 @@ class GameState:
         if self.isWin() or self.isLose():
             raise Exception('Can\'t generate a successor of a terminal state.')
 
+        return self._generateSuccessor(agentIndex, action, True)
+
+    def _generateSuccessor(self, agentIndex, action, check):
+        """
+        Returns the successor state of a non-terminal state. If `check` is
+        False, the action is trusted to be legal and is not validated.
+        """
         # Copy current state
         state = GameState(self)
 
         # Let agent's logic deal with its action's effects on the board
         if agentIndex == 0:  # Pacman is moving
-            state.data._eaten = [False for i in range(state.getNumAgents())]
-            PacmanRules.applyAction(state, action)
+            if True in state.data._eaten:
+                state.data._eaten = [False for i in range(state.getNumAgents())]
+            PacmanRules.applyAction(state, action, check)
         else:                # A ghost is moving
-            GhostRules.applyAction(state, action, agentIndex)
+            GhostRules.applyAction(state, action, agentIndex, check)
 
         # Time passes
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY  # Penalty for waiting around
-        else:
-            GhostRules.decrementTimer(state.data.agentStates[agentIndex])
+        elif state.data.agentStates[agentIndex].scaredTimer > 0:
+            GhostRules.decrementTimer(
+                state.data.getMutableAgentState(agentIndex))
 
         # Resolve multi-agent effects
         GhostRules.checkDeath(state, agentIndex)
@@ -139,6 +153,7 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
+        state.data.updateZobrist(self.data)
         GameState.explored.add(self)
         GameState.explored.add(state)
         return state
@@ -159,7 +174,12 @@ class GameState:
         if (GameState.countExpanded >= GameState.maximumExpanded):
             return None
         GameState.countExpanded += 1
-        return [(self.generateSuccessor(0, action),action) for action in self.getLegalPacmanActions() if action != Directions.STOP]
+        if self.isWin() or self.isLose():
+            return []
+        # Actions come from the legal action table: skip their validation
+        return [(self._generateSuccessor(0, action, False), action)
+                for action in PacmanRules.legalActions(self)
+                if action != Directions.STOP]
 
     def generateGhostSuccessors(self,index):
         """
@@ -169,8 +189,12 @@ class GameState:
         if (GameState.countExpanded >= GameState.maximumExpanded or index == 0):
             return None
         GameState.countExpanded += 1
-
-        return [(self.generateSuccessor(index, action),action) for action in self.getLegalActions(index) if action != Directions.STOP]
+        if self.isWin() or self.isLose():
+            return []
+        # Actions come from the legal action table: skip their validation
+        return [(self._generateSuccessor(index, action, False), action)
+                for action in GhostRules.legalActions(self, index)
+                if action != Directions.STOP]
 
     def getPacmanState(self):
         """
@@ -239,11 +263,31 @@ class GameState:
         """
         return self.data.layout.walls
 
+    def getMazeDistances(self):
+        """
+        Returns the maze distance oracle of the layout (see distances.py),
+        shared by every state and agent playing on it.
+
+        distances = state.getMazeDistances()
+        distances.distance(state.getPacmanPosition(), (x, y))
+        """
+        return getMazeDistances(self.data.layout)
+
+    def getGhostPolicy(self, ghost):
+        """
+        Returns the policy of a ghost agent compiled into a lookup table
+        (see ghostPolicy.py), shared by every state playing on the layout.
+
+        policy = state.getGhostPolicy(GreedyGhost(1))
+        policy.distribution(ghostPos, ghostDirection, scared, pacmanPos)
+        """
+        return getGhostPolicy(self, ghost)
+
     def hasFood(self, x, y):
-        return self.data.food[x][y]
+        return self.data.food.get(x, y)
 
     def hasWall(self, x, y):
-        return self.data.layout.walls[x][y]
+        return self.data.layout.walls.get(x, y)
 
     def isLose(self):
         return self.data._lose
@@ -270,6 +314,46 @@ class GameState:
         state.data = self.data.deepCopy()
         return state
 
+    def freeze(self):
+        """
+        Makes the state read-only, in place, and returns it: modifying it
+        raises an exception. Its successors and copies are writable.
+        """
+        self.data.freeze()
+        self.__class__ = ReadOnlyGameState
+        return self
+
+    def pack(self):
+        """
+        Returns the state as a compact tuple of plain values, without its
+        layout, to be sent to another process (see unpack).
+        """
+        data = self.data
+        agents = tuple((s.configuration.pos, s.configuration.direction,
+                        s.scaredTimer) for s in data.agentStates)
+        return (data.food.bits, tuple(data.capsules), agents, data.score,
+                data._win, data._lose)
+
+    def unpack(packed, template):
+        """
+        Rebuilds a state packed by pack, given a state on the same layout
+        with the same agents, e.g. the initial state of the layout.
+        """
+        bits, capsules, agents, score, win, lose = packed
+        state = template.deepCopy()
+        data = state.data
+        data.food.bits = bits
+        data.capsules = list(capsules)
+        for agentState, (pos, direction, scaredTimer) in zip(
+                data.agentStates, agents):
+            agentState.configuration = Configuration(pos, direction)
+            agentState.scaredTimer = scaredTimer
+        data.score = score
+        data._win, data._lose = win, lose
+        data._zobrist = data._boardZobrist = None
+        return state
+    unpack = staticmethod(unpack)
+
     def __eq__(self, other):
         """
         Allows two states to be compared.
@@ -282,6 +366,21 @@ class GameState:
         """
         return hash(self.data)
 
+    def zobrist(self):
+        """
+        Returns a 64-bit Zobrist hash of the agent configurations, scared
+        timers, food and capsules. It is maintained incrementally by
+        generateSuccessor, so calling it is O(1).
+        """
+        return self.data.zobrist()
+
+    def boardZobrist(self):
+        """
+        Returns a 64-bit Zobrist hash of the food and capsules, ignoring
+        the agents. Like zobrist(), calling it is O(1).
+        """
+        return self.data.boardZobrist()
+
     def __str__(self):
 
         return str(self.data)
@@ -292,6 +391,17 @@ class GameState:
         """
         self.data.initialize(layout, numGhostAgents)
 
+
+class ReadOnlyGameState(GameState):
+    """
+    A read-only game state (see GameState.freeze).
+    """
+    __slots__ = ()
+    __setattr__ = readOnlySetattr
+
+    def freeze(self):
+        return self
+
 ############################################################################
 #                     THE HIDDEN SECRETS OF PACMAN                         #
 #                                                                          #
@@ -385,20 +495,32 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions(
-            state.getPacmanState().configuration,
-            state.data.layout.walls)
+        return list(PacmanRules.legalActions(state))
     getLegalActions = staticmethod(getLegalActions)
 
-    def applyAction(state, action):
+    def legalActions(state):
         """
-        Edits the state to reflect the results of the action.
+        Returns the possible actions as a shared tuple, looked up in the
+        layout table (see Layout.computeLegalActions) when Pacman stands on
+        a cell. The tuple must not be modified.
         """
-        legal = PacmanRules.getLegalActions(state)
-        if action not in legal:
+        conf = state.data.agentStates[0].configuration
+        actions = state.data.layout.pacmanActions.get(conf.pos)
+        if actions is None:
+            actions = tuple(Actions.getPossibleActions(
+                conf, state.data.layout.walls))
+        return actions
+    legalActions = staticmethod(legalActions)
+
+    def applyAction(state, action, check=True):
+        """
+        Edits the state to reflect the results of the action. The legality
+        of the action is only verified if `check` is True.
+        """
+        if check and action not in PacmanRules.legalActions(state):
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.getMutableAgentState(0)
 
         # Update Configuration
         vector = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
@@ -416,10 +538,10 @@ class PacmanRules:
     def consume(position, state):
         x, y = position
         # Eat food
-        if state.data.food[x][y]:
+        if state.data.food.get(x, y):
             state.data.scoreChange += 10
             state.data.food = state.data.food.copy()
-            state.data.food[x][y] = False
+            state.data.food.set(x, y, False)
             state.data._foodEaten = position
             # TODO: cache numFood?
             numFood = state.getNumFood()
@@ -428,11 +550,13 @@ class PacmanRules:
                 state.data._win = True
         # Eat capsule
         if(position in state.getCapsules()):
-            state.data.capsules.remove(position)
+            state.data.capsules = [
+                c for c in state.data.capsules if c != position]
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range(1, len(state.data.agentStates)):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.getMutableAgentState(
+                    index).scaredTimer = SCARED_TIME
     consume = staticmethod(consume)
 
 
@@ -447,7 +571,20 @@ class GhostRules:
         Ghosts cannot stop, and cannot turn around unless they
         reach a dead end, but can turn 90 degrees at intersections.
         """
+        return list(GhostRules.legalActions(state, ghostIndex))
+    getLegalActions = staticmethod(getLegalActions)
+
+    def legalActions(state, ghostIndex):
+        """
+        Returns the legal actions as a shared tuple, looked up in the layout
+        table (see Layout.computeLegalActions) when the ghost stands on a
+        cell. The tuple must not be modified.
+        """
         conf = state.getGhostState(ghostIndex).configuration
+        actions = state.data.layout.ghostActions.get(
+            (conf.pos, conf.direction))
+        if actions is not None:
+            return actions
         possibleActions = Actions.getPossibleActions(
             conf, state.data.layout.walls)
         reverse = Actions.reverseDirection(conf.direction)
@@ -455,16 +592,18 @@ class GhostRules:
             possibleActions.remove(Directions.STOP)
         if reverse in possibleActions and len(possibleActions) > 1:
             possibleActions.remove(reverse)
-        return possibleActions
-    getLegalActions = staticmethod(getLegalActions)
-
-    def applyAction(state, action, ghostIndex):
+        return tuple(possibleActions)
+    legalActions = staticmethod(legalActions)
 
-        legal = GhostRules.getLegalActions(state, ghostIndex)
-        if action not in legal:
+    def applyAction(state, action, ghostIndex, check=True):
+        """
+        Edits the state to reflect the results of the action. The legality
+        of the action is only verified if `check` is True.
+        """
+        if check and action not in GhostRules.legalActions(state, ghostIndex):
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.getMutableAgentState(ghostIndex)
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0:
             speed /= 2.0
@@ -476,8 +615,10 @@ class GhostRules:
     def decrementTimer(ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint(
-                ghostState.configuration.pos)
+            # Configurations are shared with the predecessor state
+            config = ghostState.configuration
+            ghostState.configuration = Configuration(
+                nearestPoint(config.pos), config.direction)
         ghostState.scaredTimer = max(0, timer - 1)
     decrementTimer = staticmethod(decrementTimer)
 
@@ -499,9 +640,11 @@ class GhostRules:
     def collide(state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
             state.data.scoreChange += 200
+            ghostState = state.data.getMutableAgentState(agentIndex)
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
             # Added for first-person
+            state.data._eaten = list(state.data._eaten)
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
@@ -722,7 +865,7 @@ def readCommand(argv):
     if options.gameToReplay is not None:
         print('Replaying recorded game %s.' % options.gameToReplay)
         import pickle
-        f = open(options.gameToReplay)
+        f = open(options.gameToReplay, 'rb')
         try:
             recorded = pickle.load(f)
         finally:
@@ -827,10 +970,9 @@ def runGames(
             import pickle
             fname = ('recorded-game-%d' % (i + 1)) + \
                 '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            pickle.dump(components, f)
-            f.close()
+            with open(fname, 'wb') as f:
+                components = {'layout': layout, 'actions': game.moveHistory}
+                pickle.dump(components, f)
 
     if (numGames - numTraining) > 0:
         scores = [game.state.getScore() for game in games]
@@ -851,9 +993,14 @@ def runGame(
         pacman,
         ghosts,
         displayGraphics,
-        expout=np.inf):
+        expout=np.inf,
+        frameTime=0.1,
+        renderEvery=1,
+        finalOnly=False):
     display = graphicsDisplay.PacmanGraphics(
-        1.0, frameTime=0.1) if displayGraphics else textDisplay.NullGraphics()
+        1.0, frameTime=frameTime, renderEvery=renderEvery,
+        finalOnly=finalOnly) if displayGraphics \
+        else textDisplay.NullGraphics()
     import __main__
     __main__.__dict__['_display'] = display
     lay = layout.getLayout(layout_name)
@@ -0,0 +1,488 @@
+# simulator.py
+# ------------
+# Lightweight game simulation for rollouts: games are played on plain
+# integers and per-layout move tables, following PacmanRules and
+# GhostRules, without building GameState objects. BatchSimulator plays
+# many games at once on NumPy arrays.
+
+import random
+import weakref
+
+import numpy as np
+
+from .distances import getMazeDistances
+from .game import Actions, Directions, popcount
+from .ghostPolicy import ACTIONS, DIRECTIONS
+from .pacman import COLLISION_TOLERANCE, SCARED_TIME, TIME_PENALTY
+
+# Simulators, keyed by layout identity
+_SIMULATORS = weakref.WeakKeyDictionary()
+
+# Positions are stored in half cells, so that scared ghosts (moving at half
+# speed) stay on integer coordinates
+HALF_VECTORS = dict((direction, (2 * dx, 2 * dy)) for direction, (dx, dy)
+                    in Actions._directions.items())
+# Largest distance (in half cells) at which a ghost and Pacman collide
+COLLISION = int(2 * COLLISION_TOLERANCE)
+
+
+class Simulator:
+    """
+    Plays games on a layout from a game state, for rollouts.
+
+    Pacman avoids the cells next to a ghost which is not scared and does
+    not turn back, unless it has no other choice. Among the remaining
+    moves, it takes the one closest to a dot with probability `greed`, or
+    a random one otherwise. The ghosts follow their compiled policies (see
+    ghostPolicy.py). Scores, food, capsules, scared timers, collisions and
+    game ends follow the rules of pacman.py.
+    """
+
+    def __init__(self, layout, greed=0.5):
+        self.height = layout.height
+        self.greed = greed
+        self.distances = getMazeDistances(layout)
+        # Legal moves of Pacman but stopping, by cell
+        self.pacmanMoves = dict(
+            (cell, tuple(a for a in actions if a != Directions.STOP))
+            for cell, actions in layout.pacmanActions.items())
+        self.ghostMoves = layout.ghostActions
+
+    def rollout(self, state, agentIndex, policies, maxPlies, rng=random):
+        """
+        Plays a game from a state until it ends or after a number of moves.
+
+        Arguments:
+        ----------
+        - `state`: the GameState to play from.
+        - `agentIndex`: index of the agent to move first.
+        - `policies`: compiled GhostPolicy of every ghost, by ghost index
+                      (the first item, for Pacman, is ignored).
+        - `maxPlies`: maximum number of moves played.
+        - `rng`: random number generator.
+
+        Return:
+        -------
+        - A tuple (score, over, cell, food): the final score, whether the
+        game ended, the final cell of Pacman and the final food bits (as
+        in Grid.bits).
+        """
+
+        data = state.data
+        height = self.height
+        numAgents = len(data.agentStates)
+
+        score = data.score
+        food = data.food.bits
+        numFood = popcount(food)
+        index = self.distances.index
+        matrix = self.distances.matrix
+        foodCells = [index[cell] for cell in data.food.asList()]
+        capsules = set(data.capsules)
+
+        x, y = data.agentStates[0].configuration.pos
+        px, py = 2 * int(x), 2 * int(y)
+        pacmanDirection = data.agentStates[0].configuration.direction
+
+        gx, gy, gdir, timers, starts = [0], [0], [None], [0], [None]
+        for ghostState in data.agentStates[1:]:
+            x, y = ghostState.configuration.pos
+            gx.append(int(2 * x))
+            gy.append(int(2 * y))
+            gdir.append(ghostState.configuration.direction)
+            timers.append(ghostState.scaredTimer)
+            sx, sy = ghostState.start.pos
+            starts.append((int(2 * sx), int(2 * sy),
+                           ghostState.start.direction))
+
+        win = lose = False
+        agent = agentIndex
+        for ply in range(maxPlies):
+            if agent == 0:
+                moves = self.pacmanMoves[(px // 2, py // 2)]
+                safe = [a for a in moves
+                        if not self.threatened(px + HALF_VECTORS[a][0],
+                                               py + HALF_VECTORS[a][1],
+                                               gx, gy, timers)]
+                if safe:
+                    moves = safe
+                if len(moves) > 1:
+                    reverse = Actions.reverseDirection(pacmanDirection)
+                    moves = [a for a in moves if a != reverse]
+                if len(moves) > 1 and rng.random() < self.greed:
+                    closest = None
+                    for a in moves:
+                        dx, dy = HALF_VECTORS[a]
+                        d = matrix[index[((px + dx) // 2, (py + dy) // 2)],
+                                   foodCells].min()
+                        if closest is None or d < closest:
+                            closest = d
+                            pacmanDirection = a
+                else:
+                    pacmanDirection = moves[int(rng.random() * len(moves))]
+                dx, dy = HALF_VECTORS[pacmanDirection]
+                px += dx
+                py += dy
+
+                score -= TIME_PENALTY
+                bit = 1 << (px // 2 * height + py // 2)
+                if food & bit:
+                    food &= ~bit
+                    foodCells.remove(index[(px // 2, py // 2)])
+                    score += 10
+                    numFood -= 1
+                    if numFood == 0:
+                        score += 500
+                        win = True
+                cell = (px // 2, py // 2)
+                if cell in capsules:
+                    capsules.discard(cell)
+                    for i in range(1, numAgents):
+                        timers[i] = SCARED_TIME
+
+                ghosts = range(1, numAgents)
+            else:
+                i = agent
+                if gx[i] % 2 or gy[i] % 2:  # Between two cells: go straight
+                    action = gdir[i]
+                else:
+                    cell = (gx[i] // 2, gy[i] // 2)
+                    dist = policies[i].distribution(
+                        cell, gdir[i], timers[i] > 0, (px // 2, py // 2))
+                    action = self.sample(dist, rng)
+                dx, dy = HALF_VECTORS[action]
+                if timers[i] > 0:
+                    dx //= 2
+                    dy //= 2
+                gx[i] += dx
+                gy[i] += dy
+                gdir[i] = action
+
+                if timers[i] == 1:  # Back on the nearest cell
+                    gx[i] = (gx[i] + 1) // 2 * 2
+                    gy[i] = (gy[i] + 1) // 2 * 2
+                if timers[i] > 0:
+                    timers[i] -= 1
+
+                ghosts = (i,)
+
+            for i in ghosts:
+                if abs(gx[i] - px) + abs(gy[i] - py) <= COLLISION:
+                    if timers[i] > 0:
+                        score += 200
+                        gx[i], gy[i], gdir[i] = starts[i]
+                        timers[i] = 0
+                    elif not win:
+                        score -= 500
+                        lose = True
+
+            if win or lose:
+                break
+            agent = (agent + 1) % numAgents
+
+        return score, win or lose, (px // 2, py // 2), food
+
+    def threatened(self, px, py, gx, gy, timers):
+        """
+        Tells whether a ghost which is not scared stands on or next to a
+        position (in half cells).
+        """
+        for i in range(1, len(gx)):
+            if timers[i] == 0 and abs(gx[i] - px) + abs(gy[i] - py) <= 2:
+                return True
+        return False
+
+    def sample(self, distribution, rng):
+        """
+        Draws an action from a distribution given as a dict.
+        """
+        if len(distribution) == 1:
+            for action in distribution:
+                return action
+        r = rng.random()
+        for action, p in distribution.items():
+            r -= p
+            if r < 0:
+                return action
+        return action
+
+
+class BatchSimulator:
+    """
+    Plays a batch of games on a layout in lockstep, one ply of every game
+    per call to `step`, for large-scale rollouts and evaluation.
+
+    Games are held in NumPy arrays indexed by game, then by open cell (as
+    in MazeDistances) or by ghost. Pacman stands on a cell, given by its
+    index; ghosts are located in half cells, as in Simulator. Directions
+    and actions are indices in ghostPolicy.DIRECTIONS. Games which are
+    over are left unchanged by the following plies.
+
+    The ghosts follow their compiled policies (see ghostPolicy.py), which
+    makes every ghost agent with a getDistribution method, such as
+    GreedyGhost and DumbyGhost, available. Scores, food, capsules, scared
+    timers, collisions and game ends follow the rules of pacman.py.
+    """
+
+    def __init__(self, layout, policies, seed=None):
+        """
+        Arguments:
+        ----------
+        - `layout`: the layout the games are played on.
+        - `policies`: compiled GhostPolicy of every ghost, by ghost index
+                      (the first item, for Pacman, is ignored).
+        - `seed`: seed of the random number generator.
+        """
+        self.policies = policies
+        self.rng = np.random.default_rng(seed)
+
+        self.cells = sorted(layout.adjacency.keys())
+        n = len(self.cells)
+        self.xs = np.array([x for x, y in self.cells])
+        self.ys = np.array([y for x, y in self.cells])
+        # Index of the open cells, -1 on walls
+        self.cellIndex = np.full((layout.width, layout.height), -1)
+        self.cellIndex[self.xs, self.ys] = np.arange(n)
+
+        # Vectors of the actions in half cells, the stop direction last
+        self.dx = np.array([HALF_VECTORS[d][0] for d in DIRECTIONS])
+        self.dy = np.array([HALF_VECTORS[d][1] for d in DIRECTIONS])
+        self.reverse = np.array([DIRECTIONS.index(
+            Actions.reverseDirection(d)) for d in DIRECTIONS])
+
+        # Cell reached by a legal move of Pacman but stopping, -1 otherwise
+        self.pacmanNext = np.full((n, len(DIRECTIONS)), -1)
+        for i, cell in enumerate(self.cells):
+            for action in layout.pacmanActions[cell]:
+                if action != Directions.STOP:
+                    a = DIRECTIONS.index(action)
+                    self.pacmanNext[i, a] = self.cellIndex[
+                        (2 * cell[0] + self.dx[a]) // 2,
+                        (2 * cell[1] + self.dy[a]) // 2]
+
+    def load(self, states, agentIndex=0):
+        """
+        Sets up the batch from game states, one game per state.
+
+        Arguments:
+        ----------
+        - `states`: list of GameState to play from, on the layout of the
+                    simulator.
+        - `agentIndex`: index of the agent to move first in every game.
+        """
+        cellIndex = self.cellIndex
+        size = len(states)
+        numGhosts = len(states[0].data.agentStates) - 1
+        n = len(self.cells)
+
+        self.size = size
+        self.agent = agentIndex
+        self.numAgents = numGhosts + 1
+        self.pacman = np.zeros(size, dtype=int)
+        self.pacmanDirection = np.zeros(size, dtype=int)
+        self.food = np.zeros((size, n), dtype=bool)
+        self.capsules = np.zeros((size, n), dtype=bool)
+        self.score = np.zeros(size)
+        self.win = np.zeros(size, dtype=bool)
+        self.lose = np.zeros(size, dtype=bool)
+        shape = (size, numGhosts)
+        self.gx, self.gy = np.zeros(shape, int), np.zeros(shape, int)
+        self.ghostDirection = np.zeros(shape, int)
+        self.timers = np.zeros(shape, int)
+        self.startX, self.startY = np.zeros(shape, int), np.zeros(shape, int)
+        self.startDirection = np.zeros(shape, int)
+
+        for k, state in enumerate(states):
+            data = state.data
+            configuration = data.agentStates[0].configuration
+            x, y = configuration.pos
+            self.pacman[k] = cellIndex[int(x), int(y)]
+            self.pacmanDirection[k] = DIRECTIONS.index(
+                configuration.direction)
+            for x, y in data.food.asList():
+                self.food[k, cellIndex[x, y]] = True
+            for x, y in data.capsules:
+                self.capsules[k, cellIndex[x, y]] = True
+            self.score[k] = data.score
+            self.win[k], self.lose[k] = data._win, data._lose
+            for g, ghostState in enumerate(data.agentStates[1:]):
+                x, y = ghostState.configuration.pos
+                self.gx[k, g], self.gy[k, g] = int(2 * x), int(2 * y)
+                self.ghostDirection[k, g] = DIRECTIONS.index(
+                    ghostState.configuration.direction)
+                self.timers[k, g] = ghostState.scaredTimer
+                x, y = ghostState.start.pos
+                self.startX[k, g], self.startY[k, g] = int(2 * x), int(2 * y)
+                self.startDirection[k, g] = DIRECTIONS.index(
+                    ghostState.start.direction)
+        self.numFood = self.food.sum(axis=1)
+
+    def isOver(self):
+        """
+        Returns a boolean array telling which games are over.
+        """
+        return self.win | self.lose
+
+    def step(self, actions=None):
+        """
+        Plays one move of the agent to move in every game which is not over.
+
+        Arguments:
+        ----------
+        - `actions`: at Pacman turns, array of the legal actions played in
+                     every game, as indices in DIRECTIONS. By default,
+                     Pacman plays random moves without turning back,
+                     unless it has no other choice (see randomActions).
+                     Ignored at ghost turns.
+
+        Return:
+        -------
+        - The array of the actions played, as indices in DIRECTIONS, -1 in
+        the games which were over.
+        """
+        active = np.flatnonzero(~(self.win | self.lose))
+        played = np.full(self.size, -1)
+        if self.agent == 0:
+            if actions is None:
+                actions = self.randomActions()
+            played[active] = np.asarray(actions)[active]
+            self.movePacman(active, played[active])
+        else:
+            played[active] = self.moveGhost(active, self.agent - 1)
+        self.agent = (self.agent + 1) % self.numAgents
+        return played
+
+    def randomActions(self):
+        """
+        Returns an array of random legal moves of Pacman but stopping, one
+        per game, without turning back unless it is the only move.
+        """
+        legal = self.pacmanNext[self.pacman] >= 0
+        rows = np.arange(self.size)
+        reverse = legal.copy()
+        reverse[rows, self.reverse[self.pacmanDirection]] = False
+        forced = reverse.sum(axis=1) == 0
+        legal[~forced] = reverse[~forced]
+
+        # Draw the k-th legal action, k uniform in [0, number of actions)
+        counts = legal.sum(axis=1)
+        k = (self.rng.random(self.size) * counts).astype(int)
+        return (np.cumsum(legal, axis=1) <= k[:, None]).sum(axis=1)
+
+    def movePacman(self, games, actions):
+        """
+        Moves Pacman in a set of games, given by their indices, then eats
+        dots and capsules and checks collisions with every ghost.
+        """
+        cells = self.pacmanNext[self.pacman[games], actions]
+        self.pacman[games] = cells
+        self.pacmanDirection[games] = actions
+        self.score[games] -= TIME_PENALTY
+
+        eaten = self.food[games, cells]
+        ate = games[eaten]
+        self.food[ate, cells[eaten]] = False
+        self.score[ate] += 10
+        self.numFood[ate] -= 1
+        won = ate[(self.numFood[ate] == 0) & ~self.lose[ate]]
+        self.score[won] += 500
+        self.win[won] = True
+
+        capsule = self.capsules[games, cells]
+        self.capsules[games[capsule], cells[capsule]] = False
+        self.timers[games[capsule]] = SCARED_TIME
+
+        for g in range(self.numAgents - 1):
+            self.collide(games, g)
+
+    def moveGhost(self, games, g):
+        """
+        Moves a ghost in a set of games, given by their indices, following
+        its policy, then checks its collision with Pacman. Returns the
+        actions played.
+        """
+        gx, gy = self.gx[games, g], self.gy[games, g]
+        timers = self.timers[games, g]
+        actions = self.ghostDirection[games, g]
+
+        # Ghosts between two cells go straight, the others draw a move
+        onCell = np.flatnonzero((gx % 2 == 0) & (gy % 2 == 0))
+        cells = self.cellIndex[gx[onCell] // 2, gy[onCell] // 2]
+        probabilities = self.policies[g + 1].table[
+            cells, actions[onCell], (timers[onCell] > 0).astype(int),
+            self.pacman[games[onCell]]]
+        cumulative = np.cumsum(probabilities, axis=1)
+        drawn = (cumulative <= self.rng.random(len(onCell))[:, None]).sum(
+            axis=1)
+        # Rounding errors: fall back to the last possible action
+        last = len(ACTIONS) - 1 - np.argmax(probabilities[:, ::-1] > 0,
+                                            axis=1)
+        actions[onCell] = np.minimum(drawn, last)
+
+        scared = timers > 0
+        dx, dy = self.dx[actions], self.dy[actions]
+        gx += np.where(scared, dx // 2, dx)
+        gy += np.where(scared, dy // 2, dy)
+
+        snap = timers == 1  # Back on the nearest cell
+        gx[snap] = (gx[snap] + 1) // 2 * 2
+        gy[snap] = (gy[snap] + 1) // 2 * 2
+
+        self.gx[games, g], self.gy[games, g] = gx, gy
+        self.ghostDirection[games, g] = actions
+        self.timers[games, g] = np.maximum(0, timers - 1)
+
+        self.collide(games, g)
+        return actions
+
+    def collide(self, games, g):
+        """
+        Resolves the collisions between Pacman and a ghost in a set of
+        games, given by their indices.
+        """
+        distance = abs(self.gx[games, g] - 2 * self.xs[self.pacman[games]]) + \
+            abs(self.gy[games, g] - 2 * self.ys[self.pacman[games]])
+        games = games[distance <= COLLISION]
+        isScared = self.timers[games, g] > 0
+
+        killed = games[~isScared & ~self.win[games]]
+        self.score[killed] -= 500
+        self.lose[killed] = True
+
+        scared = games[isScared]
+        self.score[scared] += 200
+        self.gx[scared, g] = self.startX[scared, g]
+        self.gy[scared, g] = self.startY[scared, g]
+        self.ghostDirection[scared, g] = self.startDirection[scared, g]
+        self.timers[scared, g] = 0
+
+    def rollout(self, maxPlies, actions=None):
+        """
+        Plays every game until it ends or after a number of moves.
+
+        Arguments:
+        ----------
+        - `maxPlies`: maximum number of moves played.
+        - `actions`: function of the simulator returning the actions of
+                     Pacman (see step), random moves by default.
+
+        Return:
+        -------
+        - The final scores, as an array.
+        """
+        for ply in range(maxPlies):
+            if self.isOver().all():
+                break
+            self.step(None if actions is None or self.agent != 0
+                      else actions(self))
+        return self.score
+
+
+def getSimulator(layout):
+    """
+    Returns the Simulator of a layout, building it on first use.
+    """
+    simulator = _SIMULATORS.get(layout)
+    if simulator is None:
+        simulator = _SIMULATORS[layout] = Simulator(layout)
+    return simulator
@@ -512,14 +512,14 @@ def nSample(distribution, values, n):
     return samples
 
 
-def sample(distribution, values=None):
+def sample(distribution, values=None, rng=random):
     if isinstance(distribution, Counter):
         items = sorted(distribution.items())
         distribution = [i[1] for i in items]
         values = [i[0] for i in items]
     if sum(distribution) != 1:
         distribution = normalize(distribution)
-    choice = random.random()
+    choice = rng.random()
     i, total = 0, distribution[0]
     while choice > total:
         i += 1
@@ -549,11 +549,14 @@ def flipCoin(p):
     return r < p
 
 
-def chooseFromDistribution(distribution):
-    "Takes either a counter or a list of (prob, key) pairs and samples"
+def chooseFromDistribution(distribution, rng=random):
+    """
+    Takes either a counter or a list of (prob, key) pairs and samples,
+    drawing from the generator `rng` (the global one by default)
+    """
     if isinstance(distribution, dict) or isinstance(distribution, Counter):
-        return sample(distribution)
-    r = random.random()
+        return sample(distribution, rng=rng)
+    r = rng.random()
     base = 0.0
     for prob, element in distribution:
         base += prob
@@ -561,6 +564,15 @@ def chooseFromDistribution(distribution):
             return element
 
 
+def agentRandom(seed, index):
+    """
+    Returns the random number generator of an agent in the game played
+    with a seed. Streams of different agents are independent, and the
+    same in every process.
+    """
+    return random.Random('%s-%d' % (seed, index))
+
+
 def nearestPoint(pos):
     """
     Finds the nearest grid point to a position (discretizes).
@@ -0,0 +1,114 @@
+from concurrent.futures import ProcessPoolExecutor
+from pacman_module.layout import Layout
+from pacman_module.pacman import GameState
+import numpy as np
+
+# State of a worker process, set up by initWorker
+_agent = None
+_template = None
+
+
+def initWorker(agentClass, args, layoutText, cache, numGhosts):
+    """
+    Sets up a worker process: builds its own agent and the initial state
+    of the layout, from which the states it receives are rebuilt.
+    """
+    global _agent, _template
+    _agent = agentClass(args)
+    _template = GameState()
+    _template.initialize(Layout(list(layoutText), cache), numGhosts)
+
+
+def searchInWorker(packed, budget, taskArgs):
+    """
+    Searches a subtree in a worker process, within a node budget.
+
+    Return:
+    -------
+    - A tuple (result of `searchRootSon`, number of expanded nodes).
+    """
+    state = GameState.unpack(packed, _template)
+    GameState.countExpanded = 0
+    GameState.maximumExpanded = budget
+    result = _agent.searchRootSon(state, *taskArgs)
+    return result, GameState.countExpanded
+
+
+class RootSearchPool:
+    """
+    A pool of worker processes searching root subtrees for an agent.
+
+    Every worker builds its own instance of the agent class, whose
+    `searchRootSon(state, *args)` method searches a subtree. States are
+    sent in the compact form of GameState.pack and the layout only once,
+    when the workers start. The nodes expanded by the workers are added to
+    GameState.countExpanded, and the remaining node budget is shared
+    between the subtrees searched at once, so that the budget accounting
+    of Game.run stays correct.
+    """
+
+    def __init__(self, agent, workers):
+        """
+        Arguments:
+        ----------
+        - `agent`: the agent the subtrees are searched for.
+        - `workers`: number of worker processes.
+        """
+        self.agent = agent
+        self.workers = workers
+        self.executor = None
+        self.layout = None
+
+    def start(self, state):
+        """
+        Given a game state, starts the workers on its layout, unless they
+        already play on it.
+        """
+        layout = state.data.layout
+        if self.executor is not None and self.layout is layout:
+            return
+        self.shutdown()
+        self.layout = layout
+        self.executor = ProcessPoolExecutor(
+            self.workers, initializer=initWorker,
+            initargs=(type(self.agent), self.agent.args, layout.layoutText,
+                      layout.cache, state.getNumAgents() - 1))
+
+    def search(self, states, taskArgs, budget=None):
+        """
+        Searches subtrees in parallel.
+
+        Arguments:
+        ----------
+        - `states`: list of the game states at the root of the subtrees.
+        - `taskArgs`: list of the tuples of arguments passed to
+                      `searchRootSon` with every state.
+        - `budget`: number of nodes the searches may expand together, by
+                    default what is left of GameState.maximumExpanded.
+
+        Return:
+        -------
+        - The list of the results of `searchRootSon`, in order.
+        """
+        self.start(states[0])
+        if budget is None:
+            budget = GameState.maximumExpanded - GameState.countExpanded
+        share = budget / len(states) if np.isfinite(budget) else np.inf
+
+        futures = [self.executor.submit(searchInWorker, state.pack(),
+                                        share, args)
+                   for state, args in zip(states, taskArgs)]
+        results = []
+        for future in futures:
+            result, expanded = future.result()
+            GameState.countExpanded += expanded
+            results.append(result)
+        return results
+
+    def shutdown(self):
+        """
+        Stops the workers.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
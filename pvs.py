@@ -0,0 +1,76 @@
+from pacman_module.game import Agent
+from engine import SearchEngine, SearchTimeout
+from transposition import TranspositionTable
+import hminimax
+import time
+
+
+class PacmanAgent(Agent):
+
+    def __init__(self, args):
+        """
+        Arguments:
+        ----------
+        - `args`: Namespace of arguments from command-line prompt.
+        """
+        self.args = args
+        self.moveTime = getattr(args, 'movetime', 0.1)  # Seconds per move
+        # Deepest search: the root move plus the depth of hminimax, which
+        # uses the same evaluation (see hminimax.MAX_DEPTH)
+        self.maxDepth = getattr(args, 'maxdepth', hminimax.MAX_DEPTH) + 1
+        # Leaves are evaluated with the heuristic of hminimax
+        self.heuristic = hminimax.PacmanAgent(args)
+        self.engine = SearchEngine(
+            self.evaluate,
+            TranspositionTable(getattr(args, 'ttsize', 2 ** 18)))
+
+    def get_action(self, state):
+        """
+        Given a pacman game state, returns a legal move.
+
+        The tree is searched by Principal Variation Search with increasing
+        depths until the move deadline, and the best move of the deepest
+        complete search is returned.
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+
+        Return:
+        -------
+        - A legal move as defined in `game.Directions`.
+        """
+
+        self.heuristic.nbFood = state.getNumFood()  # Initial nb of dots
+        # The heuristic depends on the dots at the root: values of the
+        # previous move are stale
+        self.engine.table.clear()
+        self.engine.ageHistory()
+
+        deadline = time.time() + self.moveTime
+        self.engine.deadline = None  # Always complete the first search
+        value, move = self.engine.search(state, 1)
+
+        self.engine.deadline = deadline
+        for depth in range(2, self.maxDepth + 1):
+            try:
+                value, move = self.engine.search(state, depth)
+            except SearchTimeout:
+                break
+
+        return move
+
+    def evaluate(self, state):
+        """
+        Given a game state, returns its value for Pacman.
+
+        Arguments:
+        ----------
+        - `state`: the current game state.
+
+        Return:
+        -------
+        - The score of the state plus the heuristic of hminimax.
+        """
+
+        return state.getScore() + self.heuristic.PHeuristic(state)
@@ -2,7 +2,7 @@
 
 from pacman_module.game import Agent
 from pacman_module.pacman import Directions
-from random import randint
+from pacman_module.util import agentRandom
 
 
 class PacmanAgent(Agent):
@@ -13,6 +13,8 @@ class PacmanAgent(Agent):
         - `args`: Namespace of arguments from command-line prompt.
         """
         self.args = args
+        # Stream of Pacman in the game played with the seed
+        self.random = agentRandom(getattr(args, 'seed', 1), 0)
 
     def get_action(self, state):
         """
@@ -29,6 +31,6 @@ class PacmanAgent(Agent):
         """
         legals = state.getLegalActions()
         legals.remove(Directions.STOP)
-        id = randint(0, len(legals)-1)
+        id = self.random.randint(0, len(legals)-1)
 
         return legals[id]
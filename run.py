@@ -1,9 +1,14 @@
 import imp
 import os
+import random
 from argparse import ArgumentParser, ArgumentTypeError
+from itertools import product
 
+from batch import printSummary, runBatch, summarize, writeRecords
+from pacman_module.game import Game
 from pacman_module.pacman import runGame
 from pacman_module.ghostAgents import GreedyGhost, SmartyGhost, DumbyGhost
+import numpy as np
 
 
 def restricted_float(x):
@@ -20,6 +25,20 @@ def positive_integer(x):
     return x
 
 
+def strictly_positive_integer(x):
+    x = int(x)
+    if x < 1:
+        raise ArgumentTypeError("%r is not >= 1" % (x,))
+    return x
+
+
+def positive_float(x):
+    x = float(x)
+    if x <= 0:
+        raise ArgumentTypeError("%r is not > 0" % (x,))
+    return x
+
+
 def load_agent_from_file(filepath):
     class_mod = None
     expected_class = 'PacmanAgent'
@@ -48,42 +67,182 @@ if __name__ == '__main__':
     EXAMPLES:   (1) python run.py
                     - plays a game with the human agent
                       in small maze
+                (2) python run.py --agentfile hminimax.py
+                        --layout small_adv medium_adv
+                        --ghostagent greedy dumby --games 10
+                        --output games.jsonl
+                    - plays 10 games (seeds 1 to 10) per layout and
+                      ghost agent in batch mode
+                (3) python run.py --agentfile hminimax.py
+                        --frametime 0 --renderevery 10
+                    - watches a game in fast-forward, drawing one move
+                      out of 10
     """
 
     parser = ArgumentParser(usage)
-    parser.add_argument('--seed', help='RNG seed', type=int, default=1)
+    parser.add_argument(
+        '--seed',
+        help='RNG seed of the game, from which every agent draws its own '
+             'random stream (first seed in batch mode).',
+        type=int, default=1)
     parser.add_argument(
         '--agentfile',
         help='Python file containing a `PacmanAgent` class.',
         default="humanagent.py")
     parser.add_argument(
         '--ghostagent',
-        help='Ghost agent available in the `ghostAgents` module.',
-        choices=["dumby", "greedy", "smarty"], default="greedy")
+        help='Ghost agent available in the `ghostAgents` module. In batch '
+             'mode, games are played against every ghost agent given.',
+        choices=["dumby", "greedy", "smarty"], default=["greedy"],
+        nargs='+')
     parser.add_argument(
         '--layout',
-        help='Maze layout (from layout folder).',
-        default="small")
+        help='Maze layout (from layout folder). In batch mode, games are '
+             'played on every layout given.',
+        default=["small"], nargs='+')
+    parser.add_argument(
+        '--games',
+        help='Number of games per layout and ghost agent, played with '
+             'consecutive seeds from --seed. Several games, layouts or '
+             'ghost agents are played in batch mode, without display.',
+        type=strictly_positive_integer, default=1)
+    parser.add_argument(
+        '--processes',
+        help='Number of games played at once in batch mode.',
+        type=strictly_positive_integer, default=os.cpu_count() or 1)
+    parser.add_argument(
+        '--output',
+        help='File the records of the games are written to in batch mode, '
+             'one JSON object per line.',
+        default=None)
     parser.add_argument(
         '--silentdisplay',
         help="Disable the graphical display of the game.",
         action="store_true")
+    parser.add_argument(
+        '--frametime',
+        help='Duration in seconds of the animation of a move in the '
+             'graphical display (0 for none).',
+        type=float, default=0.1)
+    parser.add_argument(
+        '--renderevery',
+        help='Draw only one move out of N in the graphical display '
+             '(fast-forward).',
+        type=strictly_positive_integer, default=1)
+    parser.add_argument(
+        '--finalonly',
+        help='Draw only the final state of the game in the graphical '
+             'display.',
+        action="store_true")
+    parser.add_argument(
+        '--trusted',
+        help='Let the Pacman agent observe the live game state, made '
+             'read-only, instead of a copy.',
+        action="store_true")
+    parser.add_argument(
+        '--checktrusted',
+        help='Also compare the game state before and after the moves of '
+             'trusted agents, to catch modifications that bypass its '
+             'read-only view.',
+        action="store_true")
+    parser.add_argument(
+        '--ttsize',
+        help='Maximum number of transposition table entries kept by '
+             'the search agents.',
+        type=positive_integer, default=2 ** 18)
+    parser.add_argument(
+        '--moveordering',
+        help='Move ordering of the alpha-beta agent: killer moves and '
+             'history only, or also maze distance to the nearest dot.',
+        choices=["none", "history", "distance"], default="distance")
+    parser.add_argument(
+        '--aspiration',
+        help='Half-width of the root aspiration window of the alpha-beta '
+             'agent, around the value of its previous move (0 to disable).',
+        type=positive_integer, default=10)
+    parser.add_argument(
+        '--movetime',
+        help='Time (in seconds) the depth-limited agent may spend '
+             'deepening its search at each move.',
+        type=positive_float, default=0.1)
+    parser.add_argument(
+        '--maxdepth',
+        help='Deepest search of the depth-limited agent, whatever the time '
+             'left (plus the root move for the principal variation search '
+             'agent).',
+        type=strictly_positive_integer, default=6)
+    parser.add_argument(
+        '--nodefraction',
+        help='Fraction of the node expansion budget the depth-limited '
+             'agent may use at each move.',
+        type=restricted_float, default=0.9)
+    parser.add_argument(
+        '--starpruning',
+        help='Pruning of the chance nodes of the expectimax agent.',
+        choices=["none", "star1", "star2"], default="star1")
+    parser.add_argument(
+        '--workers',
+        help='Number of worker processes searching the root subtrees of '
+             'the minimax, alpha-beta and depth-limited agents (0 to '
+             'search in the main process).',
+        type=positive_integer, default=0)
+    parser.add_argument(
+        '--exploration',
+        help='Exploration constant of the UCT formula of the Monte Carlo '
+             'Tree Search agent, in score points.',
+        type=positive_float, default=20.)
+    parser.add_argument(
+        '--rolloutdepth',
+        help='Maximum number of moves of the rollouts of the Monte Carlo '
+             'Tree Search agent.',
+        type=positive_integer, default=50)
 
     args = parser.parse_args()
+    Game.checkTrusted = args.checktrusted
+
+    games = list(product(args.layout, args.ghostagent,
+                         range(args.seed, args.seed + args.games)))
+    if len(games) > 1 or args.output is not None:
+        if args.agentfile == "humanagent.py":
+            print("Human agent cannot play in batch mode")
+            exit()
+        agentClass = load_agent_from_file(args.agentfile)
+        records = runBatch([(agentClass, args, layout, ghost, ghosts[ghost],
+                             seed) for layout, ghost, seed in games],
+                           args.processes)
+        if args.output is not None:
+            writeRecords(args.output, records)
+        printSummary(summarize(records))
+        exit()
+
+    args.layout = args.layout[0]
+    args.ghostagent = args.ghostagent[0]
+    random.seed(args.seed)
+    np.random.seed(args.seed)
 
     if (args.agentfile == "humanagent.py" and args.silentdisplay):
         print("Human agent cannot play without graphical display")
         exit()
+    if (args.agentfile == "humanagent.py" and
+            (args.finalonly or args.renderevery > 1)):
+        print("Human agent cannot play without drawing every move")
+        exit()
     agent = load_agent_from_file(args.agentfile)(args)
+    if args.trusted:
+        agent.trusted = True
 
     gagt = ghosts[args.ghostagent]
     nghosts = 1
     if (nghosts > 0):
         gagts = [gagt(i + 1) for i in range(nghosts)]
+        for ghost in gagts:
+            ghost.seed(args.seed)
     else:
         gagts = []
     total_score, total_computation_time, total_expanded_nodes = runGame(
-        args.layout, agent, gagts, not args.silentdisplay, expout=0)
+        args.layout, agent, gagts, not args.silentdisplay, expout=0,
+        frameTime=args.frametime, renderEvery=args.renderevery,
+        finalOnly=args.finalonly)
 
     print("Total score : " + str(total_score))
     print("Total computation time (seconds) : " + str(total_computation_time))
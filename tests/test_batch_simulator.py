@@ -0,0 +1,59 @@
+# test_batch_simulator.py
+# -----------------------
+# The games of BatchSimulator must follow the rules of GameState ply by
+# ply.
+
+import random
+
+import pytest
+
+from benchmarks import sampleStates
+from pacman_module.ghostAgents import DumbyGhost, GreedyGhost, SmartyGhost
+from pacman_module.ghostPolicy import DIRECTIONS
+from pacman_module.simulator import BatchSimulator
+
+from .test_zobrist import getTestLayout
+
+GHOSTS = {'greedy': GreedyGhost, 'smarty': SmartyGhost, 'dumby': DumbyGhost}
+
+
+def assertSameGame(simulator, k, state):
+    """
+    Checks that game `k` of the simulator is in the game state.
+    """
+    pacman = simulator.pacman[k]
+    assert (simulator.xs[pacman], simulator.ys[pacman]) == \
+        state.getPacmanPosition()
+    assert simulator.score[k] == state.getScore()
+    assert simulator.numFood[k] == state.getNumFood()
+    assert simulator.capsules[k].sum() == len(state.getCapsules())
+    assert (simulator.win[k], simulator.lose[k]) == \
+        (state.isWin(), state.isLose())
+    for g, ghostState in enumerate(state.getGhostStates()):
+        assert (simulator.gx[k, g] / 2, simulator.gy[k, g] / 2) == \
+            ghostState.getPosition()
+        assert simulator.timers[k, g] == ghostState.scaredTimer
+
+
+@pytest.mark.parametrize('ghost', ['greedy', 'smarty', 'dumby'])
+@pytest.mark.parametrize('name', ['capsules', 'small_adv', 'medium_adv',
+                                  'large_adv'])
+def test_batch_simulator_matches_game_state(name, ghost):
+    lay = getTestLayout(name)
+    rng = random.Random(0)
+    states = [state for state, agent in sampleStates(lay, 40, rng)
+              if agent == 0][:16]
+    simulator = BatchSimulator(lay, [None, states[0].getGhostPolicy(
+        GHOSTS[ghost](1))], seed=0)
+    simulator.load(states)
+
+    for ply in range(200):
+        agent = simulator.agent
+        played = simulator.step()
+        for k, action in enumerate(played):
+            if action < 0:  # Game over
+                assert states[k].isWin() or states[k].isLose()
+                continue
+            states[k] = states[k].generateSuccessor(agent,
+                                                    DIRECTIONS[action])
+            assertSameGame(simulator, k, states[k])
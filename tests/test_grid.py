@@ -0,0 +1,79 @@
+# test_grid.py
+# ------------
+# The bitboard Grid must behave like the list of lists it replaced.
+
+import random
+
+import pytest
+
+from pacman_module.game import Grid
+
+
+class ListGrid:
+    """
+    Reference grid, stored as a list of columns of booleans.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.data = [[False] * height for x in range(width)]
+
+    def count(self, item=True):
+        return sum(column.count(item) for column in self.data)
+
+    def asList(self, key=True):
+        return [(x, y) for x in range(self.width) for y in range(self.height)
+                if self.data[x][y] == key]
+
+
+def assertSameGrid(grid, reference):
+    for x in range(reference.width):
+        for y in range(reference.height):
+            assert grid.get(x, y) == reference.data[x][y]
+            assert grid[x][y] == reference.data[x][y]
+    for item in (True, False):
+        assert grid.count(item) == reference.count(item)
+        assert grid.asList(item) == reference.asList(item)
+
+
+@pytest.mark.parametrize('width,height', [(1, 1), (3, 7), (20, 11),
+                                          (40, 30)])
+def test_grid_matches_list_grid(width, height):
+    rng = random.Random(width * height)
+    grid = Grid(width, height)
+    reference = ListGrid(width, height)
+    for i in range(4 * width * height):
+        x, y = rng.randrange(width), rng.randrange(height)
+        value = rng.random() < 0.5
+        if i % 2:
+            grid[x][y] = value
+        else:
+            grid.set(x, y, value)
+        reference.data[x][y] = value
+        if i % 10 == 0:
+            assertSameGrid(grid, reference)
+    assertSameGrid(grid, reference)
+
+    unpacked = Grid(width, height, bitRepresentation=grid.packBits()[2:])
+    assert unpacked == grid
+    assertSameGrid(unpacked, reference)
+
+
+def test_grid_copies_and_freeze():
+    grid = Grid(5, 4, True)
+    grid.freeze()
+    with pytest.raises(Exception):
+        grid[2][3] = False
+
+    copy = grid.copy()
+    copy[2][3] = False
+    assert grid[2][3] and not copy[2][3]
+    assert grid.count() == 20 and copy.count() == 19
+    assert hash(copy) != hash(grid) and copy != grid
+
+
+def test_grid_sizes():
+    assert Grid(3, 4) != Grid(5, 4)
+    assert Grid(4, 3) != Grid(4, 5)
+    assert Grid(3, 4) == Grid(3, 4)
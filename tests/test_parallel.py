@@ -0,0 +1,75 @@
+# test_parallel.py
+# ----------------
+# The root subtrees searched by worker processes must have the values of
+# the serial search.
+
+import importlib
+import random
+from argparse import Namespace
+
+import numpy as np
+import pytest
+
+from benchmarks import sampleStates
+
+from .test_zobrist import getTestLayout
+
+
+def pacmanStates(name, numStates, seed):
+    """
+    Returns sampled states of a layout where Pacman is to move.
+    """
+    samples = sampleStates(getTestLayout(name), 2 * numStates,
+                           random.Random(seed))
+    return [state for state, agent in samples if agent == 0][:numStates]
+
+
+def makeAgents(module, **args):
+    """
+    Returns a serial agent and an agent with two worker processes.
+    """
+    agentClass = importlib.import_module(module).PacmanAgent
+    return (agentClass(Namespace(workers=0, **args)),
+            agentClass(Namespace(workers=2, **args)))
+
+
+def test_parallel_minimax():
+    serial, parallel = makeAgents('minimax')
+    try:
+        for state in pacmanStates('small_adv', 20, 0):
+            sons = [son for son, move in state.generatePacmanSuccessors()]
+            rootKey = serial.generateKey(state, True)
+            values = [serial.searchRootSon(son, rootKey) for son in sons]
+            assert parallel.pool.search(sons, [(rootKey,)] * len(sons)) == \
+                values
+    finally:
+        parallel.pool.shutdown()
+
+
+def test_parallel_alphabeta():
+    serial, parallel = makeAgents('alphabeta')
+    try:
+        for state in pacmanStates('small_adv', 20, 1):
+            assert parallel.get_action(state) == serial.get_action(state)
+    finally:
+        parallel.pool.shutdown()
+
+
+@pytest.mark.parametrize('name', ['medium_adv', 'large_adv'])
+def test_parallel_hminimax(name):
+    serial, parallel = makeAgents('hminimax')
+    try:
+        for state in pacmanStates(name, 10, 2):
+            results = []
+            for agent in (serial, parallel):
+                agent.nbFood = state.getNumFood()
+                agent.deadline = np.inf
+                agent.abortable = False
+                agent.nodeBudget = np.inf
+                agent.horizonReached = False
+                sons = state.generatePacmanSuccessors()
+                values = agent.searchSons(sons, 3)
+                results.append((values, agent.horizonReached))
+            assert results[0] == results[1]
+    finally:
+        parallel.pool.shutdown()
@@ -0,0 +1,73 @@
+# test_successors.py
+# ------------------
+# Successors share the food, capsules and agent states of their
+# predecessor until they modify them: generating successors must leave
+# the predecessor as it was.
+
+import random
+
+import pytest
+
+from benchmarks import sampleStates
+
+from .test_zobrist import getTestLayout
+
+
+def snapshot(state):
+    """
+    Returns a copy of everything a successor could modify in a state.
+    """
+    data = state.data
+    agents = tuple((a.configuration.pos, a.configuration.direction,
+                    a.scaredTimer, a.numCarrying) for a in data.agentStates)
+    return (data.food.bits, tuple(data.capsules), agents, tuple(data._eaten),
+            data.score, data._lose, data._win, state.zobrist())
+
+
+def descendants(state, depth):
+    """
+    Returns the successors of a state up to a depth, generated by the
+    unchecked successor functions of the search.
+    """
+    states = [state]
+    for ply in range(depth):
+        sons = []
+        for s in states:
+            if not (s.isWin() or s.isLose()):
+                sons += [son for son, move in s.generatePacmanSuccessors()]
+                sons += [son for son, move in s.generateGhostSuccessors(1)]
+        states = sons
+    return states
+
+
+@pytest.mark.parametrize('name', ['capsules', 'small_adv', 'medium_adv'])
+def test_successors_do_not_modify_predecessor(name):
+    rng = random.Random(0)
+    for state, agent in sampleStates(getTestLayout(name), 100, rng):
+        before = snapshot(state)
+        after = [snapshot(s) for s in descendants(state, 3)]
+        assert snapshot(state) == before
+        # Later generations do not modify the earlier ones either
+        assert [snapshot(s) for s in descendants(state, 3)] == after
+
+
+@pytest.mark.parametrize('name', ['capsules', 'small_adv'])
+def test_unchecked_successors(name):
+    rng = random.Random(1)
+    for state, agent in sampleStates(getTestLayout(name), 100, rng):
+        sons = state.generatePacmanSuccessors() + \
+            state.generateGhostSuccessors(1)
+        for son, move in sons:
+            index = 0 if son.data._agentMoved == 0 else 1
+            checked = state.generateSuccessor(index, move)
+            assert snapshot(son) == snapshot(checked)
+
+
+def test_successors_of_frozen_state():
+    state = sampleStates(getTestLayout('capsules'), 20, random.Random(2))[-1][0]
+    before = snapshot(state)
+    state.freeze()
+    sons = descendants(state, 3)
+    assert snapshot(state) == before
+    assert sons and all(snapshot(son) == snapshot(son.deepCopy())
+                        for son in sons)
@@ -0,0 +1,57 @@
+# test_zobrist.py
+# ---------------
+# The Zobrist hashes maintained incrementally by generateSuccessor must be
+# the hashes computed from scratch.
+
+import os
+import random
+
+import pytest
+
+from benchmarks import LAYOUT_DIRECTORY, sampleStates
+from pacman_module import layout
+from pacman_module.layout import Layout
+
+# Small layout with capsules, so that eaten capsules and scared timers are
+# hashed too
+CAPSULE_LAYOUT = [
+    '%%%%%%%',
+    '%o...G%',
+    '%.%%%.%',
+    '%P...o%',
+    '%%%%%%%',
+]
+
+
+def getTestLayout(name):
+    if name == 'capsules':
+        return Layout(CAPSULE_LAYOUT)
+    return layout.tryToLoad(os.path.join(LAYOUT_DIRECTORY, name + '.lay'))
+
+
+def scratchZobrist(state):
+    """
+    Returns the Zobrist hash and board hash of a state, computed from
+    scratch.
+    """
+    data = state.data.deepCopy()
+    data._zobrist = None
+    data._boardZobrist = None
+    return data.zobrist(), data.boardZobrist()
+
+
+@pytest.mark.parametrize('name', ['capsules', 'small_adv', 'medium_adv',
+                                  'large_adv', 'small'])
+def test_incremental_zobrist(name):
+    for state, agent in sampleStates(getTestLayout(name), 500,
+                                     random.Random(0)):
+        assert (state.zobrist(), state.boardZobrist()) == \
+            scratchZobrist(state)
+
+
+def test_zobrist_of_successors():
+    rng = random.Random(1)
+    for state, agent in sampleStates(getTestLayout('capsules'), 200, rng):
+        for son, move in state.generatePacmanSuccessors() + \
+                state.generateGhostSuccessors(1):
+            assert son.zobrist() == scratchZobrist(son)[0]
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+
+
+class TranspositionTable:
+    """
+    A bounded transposition table mapping position keys to search results.
+
+    Entries are kept in least-recently-used order. When the table is full,
+    the victim is chosen among the `window` least recently used entries,
+    preferring the one searched with the smallest draft (depth-preferred
+    replacement). A window of 1 gives plain LRU replacement.
+    """
+
+    EXACT = 0  # The stored value is the exact minimax value
+    LOWER = 1  # The stored value is a lower bound (fail-high)
+    UPPER = 2  # The stored value is an upper bound (fail-low)
+
+    def __init__(self, maxEntries=2 ** 18, window=8):
+        """
+        Arguments:
+        ----------
+        - `maxEntries`: maximum number of entries kept in memory.
+        - `window`: number of least recently used entries examined
+                    when looking for an entry to evict.
+        """
+        self.maxEntries = max(1, int(maxEntries))
+        self.window = max(1, int(window))
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key):
+        """
+        Given a position key, returns the stored entry or None.
+
+        Arguments:
+        ----------
+        - `key`: hashable position key.
+
+        Return:
+        -------
+        - A tuple (value, flag, draft, move, contexts) or None.
+        """
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def store(self, key, value, flag, draft, move=None, contexts=0):
+        """
+        Stores a search result, evicting an entry if the table is full.
+
+        Arguments:
+        ----------
+        - `key`: hashable position key.
+        - `value`: value found by the search.
+        - `flag`: one of EXACT, LOWER or UPPER.
+        - `draft`: amount of search behind the value (remaining depth,
+                   or subtree size for searches without depth limit).
+        - `move`: best move found at the position, if any.
+        - `contexts`: bit set of the contexts the value depends on, for
+                      searches whose values depend on the path (see
+                      minimax.py).
+        """
+
+        old = self.entries.get(key)
+        if old is not None:
+            # Keep deeper exact results over shallower bounds
+            if old[2] > draft and old[1] == self.EXACT and \
+                    flag != self.EXACT:
+                self.entries.move_to_end(key)
+                return
+        elif len(self.entries) >= self.maxEntries:
+            self._evict()
+
+        self.entries[key] = (value, flag, draft, move, contexts)
+        self.entries.move_to_end(key)
+
+    def _evict(self):
+        """
+        Removes the shallowest entry among the least recently used ones.
+        """
+
+        victim = None
+        victimDraft = None
+        for i, (key, entry) in enumerate(self.entries.items()):
+            if i == self.window:
+                break
+            if victim is None or entry[2] < victimDraft:
+                victim = key
+                victimDraft = entry[2]
+
+        del self.entries[victim]